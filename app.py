@@ -1,13 +1,77 @@
-from fastapi import FastAPI, HTTPException, Query
-from fastapi.responses import PlainTextResponse
+import asyncio
+from contextlib import asynccontextmanager
+from typing import List
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from pydantic import BaseModel
 import json
+import hashlib
 import httpx
 from tasksA import *
 from tasksB import *
 from config import *
+from http_client import create_http_client, use_client
+from classifier import classify_task, TASK_PARSER_STATS
+from task_cache import TaskInfoCache
+from jobs import JobQueue, QueueFullError
+from dispatch import TaskDispatcher
+from batch import run_plan
+from prettier_worker import warm_up_prettier, close_prettier_pools
+from db_pool import db_pool
+from ocr import check_ocr_backend
+from query_cache import get_query_cache
+from crawler import get_http_cache
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Own the pooled HTTP client and the background job queue for the lifetime of the app."""
+    async with create_http_client() as client:
+        app.state.http_client = client
+        app.state.job_queue = JobQueue(
+            lambda task: get_task_info(task, client),
+            lambda task_info: execute_task(task_info, client),
+            workers=JOB_WORKERS,
+            type_limits=parse_type_map(JOB_TYPE_LIMITS, int),
+            max_queued=JOB_QUEUE_SIZE,
+            max_history=JOB_HISTORY_SIZE
+        )
+        app.state.job_queue.start()
+        check_ocr_backend()
+        
+        # Install and start prettier in the background so the first A2 is fast
+        app.state.prettier_warmup = None
+        if PRETTIER_WARMUP_VERSION:
+            app.state.prettier_warmup = asyncio.create_task(asyncio.to_thread(warm_up_prettier, PRETTIER_WARMUP_VERSION))
+        
+        try:
+            yield
+        finally:
+            # Stop waiting for an unfinished warm-up; its worker exits once its stdin closes
+            if app.state.prettier_warmup is not None:
+                app.state.prettier_warmup.cancel()
+                await asyncio.gather(app.state.prettier_warmup, return_exceptions=True)
+            await app.state.job_queue.stop()
+            task_dispatcher.shutdown()
+            close_prettier_pools()
+            db_pool.close()
+
+app = FastAPI(lifespan=lifespan)
+
+# Parsed task descriptions, so identical tasks only pay for the LLM once
+task_info_cache = TaskInfoCache(
+    os.path.join(CACHE_DIR, "task_info"),
+    max_memory_entries=TASK_CACHE_MEMORY_SIZE,
+    max_disk_entries=TASK_CACHE_DISK_SIZE,
+    ttl=TASK_CACHE_TTL
+) if TASK_CACHE_ENABLED else None
+
+# Keeps blocking task bodies off the event loop
+task_dispatcher = TaskDispatcher(
+    parse_type_map(TASK_EXECUTION_MODES),
+    thread_workers=TASK_THREAD_WORKERS,
+    process_workers=TASK_PROCESS_WORKERS
+)
 
 # Enable CORS
 app.add_middleware(
@@ -19,23 +83,69 @@ app.add_middleware(
 )
 
 @app.post("/run")
-async def run_task(task: str = Query(..., description="Task description")):
+async def run_task(
+    request: Request,
+    task: str = Query(..., description="Task description"),
+    run_async: bool = Query(False, alias="async", description="Queue the task and return a job id")
+):
     """Execute a task based on the provided description."""
+    client = request.app.state.http_client
+    
+    # Queue the task and let the caller poll /jobs/{job_id}
+    if run_async:
+        try:
+            job = request.app.state.job_queue.submit(task)
+        except QueueFullError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        return JSONResponse(status_code=202, content={"status": "accepted", "job_id": job["id"]})
+    
     try:
         # Extract task type and parameters using LLM
-        task_info = await get_task_info(task)
+        task_info = await get_task_info(task, client)
         
         # Execute the appropriate task
-        if task_info["task_type"].startswith("A"):
-            result = await execute_task_a(task_info)
-        else:
-            result = await execute_task_b(task_info)
+        result = await execute_task(task_info, client)
             
         return {"status": "success", "message": "Task completed successfully"}
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+class BatchRequest(BaseModel):
+    tasks: List[str]
+
+@app.post("/run/batch")
+async def run_batch(request: Request, batch: BatchRequest):
+    """Execute many task descriptions, streaming one JSON result per line as tasks finish.
+
+    Tasks run concurrently unless one reads or writes a path that an earlier
+    task in the batch writes, in which case it waits for that task.
+    """
+    if len(batch.tasks) > BATCH_MAX_TASKS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_TASKS} tasks per batch")
+    
+    client = request.app.state.http_client
+    task_infos = await get_task_infos(batch.tasks, client)
+    
+    async def stream_results():
+        async for result in run_plan(
+            batch.tasks,
+            task_infos,
+            lambda task_info: execute_task(task_info, client),
+            concurrency=BATCH_CONCURRENCY
+        ):
+            yield json.dumps(result) + "\n"
+    
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+@app.get("/jobs/{job_id}")
+async def get_job(request: Request, job_id: str):
+    """Return the status, timing and result of a queued task."""
+    job = request.app.state.job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return job
+
 @app.get("/read")
 async def read_file(path: str = Query(..., description="File path to read")):
     """Read and return the contents of a file."""
@@ -65,104 +175,240 @@ async def read_file(path: str = Query(..., description="File path to read")):
             raise e
         raise HTTPException(status_code=500, detail=str(e))
 
-async def get_task_info(task_description: str):
-    """Use LLM to parse task description and identify the task type and parameters."""
-    system_prompt = """You are a task parser. Given a task description, identify the task type (A1-A10, B1-B10) and extract relevant parameters.
+@app.get("/stats")
+async def get_stats(request: Request):
+    """Return counters for the task parsing paths, caches, job queue and database pool."""
+    stats = {
+        "task_parser": dict(TASK_PARSER_STATS),
+        "job_queue": request.app.state.job_queue.get_stats(),
+        "db_pool": db_pool.get_stats(),
+    }
+    if task_info_cache is not None:
+        stats["task_info_cache"] = task_info_cache.get_stats()
+    query_cache = get_query_cache()
+    if query_cache is not None:
+        stats["b5_result_cache"] = query_cache.get_stats()
+    http_cache = get_http_cache()
+    if http_cache is not None:
+        stats["b6_http_cache"] = http_cache.get_stats()
+    return stats
+
+TASK_PARSER_PROMPT = """You are a task parser. Given a task description, identify the task type (A1-A10, B1-B10) and extract relevant parameters.
     For Task A1: Return {"task_type": "A1", "parameters": {"email": "<email>"}}
     For Task A2: Return {"task_type": "A2", "parameters": {"prettier_version": "prettier@3.4.2", "filename": "/data/format.md"}}
-    For Task A3: Return {"task_type": "A3", "parameters": {"filename": "/data/dates.txt", "targetfile": "/data/dates-wednesdays.txt"}}
+    For Task A3: Return {"task_type": "A3", "parameters": {"filename": "/data/dates.txt", "targetfile": "/data/dates-wednesdays.txt", "weekday": "wednesday"}}
     For Task A4: Return {"task_type": "A4", "parameters": {"filename": "/data/contacts.json", "targetfile": "/data/contacts-sorted.json"}}
     For Task A5: Return {"task_type": "A5", "parameters": {"log_dir": "/data/logs", "output_file": "/data/logs-recent.txt", "num_files": 10}}
     For Task A6: Return {"task_type": "A6", "parameters": {"doc_dir": "/data/docs", "output_file": "/data/docs/index.json"}}
     For Task A7: Return {"task_type": "A7", "parameters": {"filename": "/data/email.txt", "output_file": "/data/email-sender.txt"}}
     For Task A8: Return {"task_type": "A8", "parameters": {"image_path": "/data/credit-card.png", "output_file": "/data/credit-card.txt"}}
     For Task A9: Return {"task_type": "A9", "parameters": {"filename": "/data/comments.txt", "output_file": "/data/comments-similar.txt"}}
-    For Task A10: Return {"task_type": "A10", "parameters": {"db_path": "/data/ticket-sales.db", "output_file": "/data/ticket-sales-gold.txt"}}
+    For Task A10: Return {"task_type": "A10", "parameters": {"db_path": "/data/ticket-sales.db", "output_file": "/data/ticket-sales-gold.txt", "ticket_type": "gold"}}
     For Task B3: Return {"task_type": "B3", "parameters": {"url": "<api_url>", "save_path": "/data/<output_file>"}}
     For Task B5: Return {"task_type": "B5", "parameters": {"db_path": "<db_path>", "query": "<sql_query>", "output_path": "/data/<output_file>"}}
     For Task B6: Return {"task_type": "B6", "parameters": {"url": "<website_url>", "output_path": "/data/<output_file>"}}
+    For Task B6 crawling several pages: Return {"task_type": "B6", "parameters": {"url": "<first_url>", "urls": ["<website_url>", ...], "depth": <link_depth>, "output_path": "/data/<output_file>.ndjson"}}
     For Task B7: Return {"task_type": "B7", "parameters": {"image_path": "<input_image>", "output_path": "/data/<output_file>", "width": "<width>", "height": "<height>"}}
     For Task B9: Return {"task_type": "B9", "parameters": {"md_path": "<markdown_file>", "output_path": "/data/<output_file>"}}
     For Task B10: Return {"task_type": "B10", "parameters": {"csv_path": "<csv_file>", "filter_column": "<column>", "filter_value": "<value>", "output_path": "/data/<output_file>"}}
     Return ONLY the JSON object."""
+
+TASK_PARSER_BATCH_PROMPT = TASK_PARSER_PROMPT + """
+    You will be given a JSON array of task descriptions. Return ONLY a JSON array with one such object per description, in the same order."""
+
+# Cached parses are only reused with the prompt that produced them
+TASK_PARSER_PROMPT_VERSION = hashlib.sha256(TASK_PARSER_PROMPT.encode("utf-8")).hexdigest()[:16]
+
+# Task types execute_task can run
+KNOWN_TASK_TYPES = {f"A{i}" for i in range(1, 11)} | {"B3", "B5", "B6", "B7", "B9", "B10"}
+
+def valid_task_info(task_info) -> bool:
+    """Whether an LLM answer is a task we can run, and so worth caching."""
+    return (
+        isinstance(task_info, dict)
+        and task_info.get("task_type") in KNOWN_TASK_TYPES
+        and isinstance(task_info.get("parameters"), dict)
+    )
+
+def lookup_task_info(task_description: str):
+    """Resolve a task description without the LLM.
+
+    Returns (task_info, cache_key); task_info is None when the LLM is needed,
+    and cache_key is where its answer should be stored.
+    """
+    # Try the local classifier first, only fall back to the LLM when unsure
+    if CLASSIFIER_ENABLED:
+        task_info, confidence = classify_task(task_description)
+        if task_info is not None and confidence >= CLASSIFIER_MIN_CONFIDENCE:
+            TASK_PARSER_STATS["classifier"] += 1
+            print(f"Classified task info: {task_info} (confidence {confidence:.2f})")  # Debug log
+            return task_info, None
     
-    print(f"Task description: {task_description}")  # Debug log
+    # Reuse an earlier LLM parse of the same description and prompt
+    cache_key = None
+    if task_info_cache is not None:
+        cache_key = task_info_cache.make_key(task_description, TASK_PARSER_PROMPT_VERSION)
+        task_info = task_info_cache.get(cache_key)
+        # Entries stored before answers were validated may not be runnable
+        if valid_task_info(task_info):
+            TASK_PARSER_STATS["cache"] += 1
+            print(f"Cached task info: {task_info}")  # Debug log
+            return task_info, cache_key
     
-    try:
-        async with httpx.AsyncClient() as client:
-            headers = {"Authorization": f"Bearer {AIPROXY_TOKEN}"}
-            response = await client.post(
-                OPENAI_CHAT_URL,
-                headers=headers,
-                json={
-                    "model": "gpt-4o-mini",
-                    "messages": [
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": task_description}
-                    ]
-                }
-            )
+    return None, cache_key
+
+async def ask_task_parser(client: httpx.AsyncClient, system_prompt: str, content: str):
+    """Send content to the LLM task parser and return its decoded JSON answer."""
+    async with use_client(client) as client:
+        headers = {"Authorization": f"Bearer {AIPROXY_TOKEN}"}
+        response = await client.post(
+            OPENAI_CHAT_URL,
+            headers=headers,
+            json={
+                "model": "gpt-4o-mini",
+                "messages": [
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": content}
+                ]
+            }
+        )
+        
+        if response.status_code != 200:
+            raise HTTPException(status_code=500, detail=f"Failed to parse task using LLM: {response.text}")
             
-            if response.status_code != 200:
-                raise HTTPException(status_code=500, detail=f"Failed to parse task using LLM: {response.text}")
-                
-            result = response.json()
-            task_info = json.loads(result["choices"][0]["message"]["content"])
-            print(f"Parsed task info: {task_info}")  # Debug log
-            return task_info
+        result = response.json()
+        return json.loads(result["choices"][0]["message"]["content"])
+
+async def parse_task_with_llm(task_description: str, cache_key: str = None, client: httpx.AsyncClient = None):
+    """Parse a single task description with the LLM and cache the answer."""
+    TASK_PARSER_STATS["llm"] += 1
+    try:
+        task_info = await ask_task_parser(client, TASK_PARSER_PROMPT, task_description)
+        print(f"Parsed task info: {task_info}")  # Debug log
+        # Never cache an answer we can't run, it would be replayed for TASK_CACHE_TTL
+        if not valid_task_info(task_info):
+            raise ValueError(f"Unrecognized task: {json.dumps(task_info)}")
+        if cache_key is not None:
+            task_info_cache.put(cache_key, task_info)
+        return task_info
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to parse task using LLM: {str(e)}")
 
-async def execute_task_a(task_info):
+async def get_task_info(task_description: str, client: httpx.AsyncClient = None):
+    """Use LLM to parse task description and identify the task type and parameters."""
+    print(f"Task description: {task_description}")  # Debug log
+    
+    task_info, cache_key = lookup_task_info(task_description)
+    if task_info is not None:
+        return task_info
+    
+    return await parse_task_with_llm(task_description, cache_key, client)
+
+async def get_task_infos(task_descriptions: list, client: httpx.AsyncClient = None):
+    """Parse many task descriptions, asking the LLM once for all unresolved ones.
+
+    Entries that cannot be parsed are returned as the exception instead.
+    """
+    task_infos = [None] * len(task_descriptions)
+    pending = {}  # index -> cache key
+    for i, task_description in enumerate(task_descriptions):
+        print(f"Task description: {task_description}")  # Debug log
+        task_info, cache_key = lookup_task_info(task_description)
+        if task_info is not None:
+            task_infos[i] = task_info
+        else:
+            pending[i] = cache_key
+    
+    if len(pending) > 1:
+        TASK_PARSER_STATS["llm_batch"] += 1
+        try:
+            parsed = await ask_task_parser(
+                client,
+                TASK_PARSER_BATCH_PROMPT,
+                json.dumps([task_descriptions[i] for i in pending])
+            )
+        except Exception as e:
+            parsed = None
+            print(f"Batch parse failed, parsing tasks one by one: {e}")  # Debug log
+        
+        if isinstance(parsed, list) and len(parsed) == len(pending):
+            unresolved = {}
+            for (i, cache_key), task_info in zip(pending.items(), parsed):
+                # Answers we can't run are asked again one by one rather than cached
+                if not valid_task_info(task_info):
+                    unresolved[i] = cache_key
+                    continue
+                task_infos[i] = task_info
+                if cache_key is not None:
+                    task_info_cache.put(cache_key, task_info)
+            pending = unresolved
+    
+    # Anything the batch call couldn't answer is parsed individually
+    results = await asyncio.gather(
+        *(parse_task_with_llm(task_descriptions[i], cache_key, client) for i, cache_key in pending.items()),
+        return_exceptions=True
+    )
+    for i, task_info in zip(pending, results):
+        task_infos[i] = task_info
+    
+    return task_infos
+
+async def execute_task(task_info, client: httpx.AsyncClient = None):
+    """Execute a parsed task of either phase."""
+    if task_info["task_type"].startswith("A"):
+        return await execute_task_a(task_info, client)
+    return await execute_task_b(task_info, client)
+
+async def execute_task_a(task_info, client: httpx.AsyncClient = None):
     """Execute Phase A tasks."""
     task_type = task_info["task_type"]
     params = task_info["parameters"]
     
     if task_type == "A1":
-        return await A1(params["email"])
+        return await task_dispatcher.run(task_type, A1, params["email"])
     elif task_type == "A2":
-        return await A2(params.get("prettier_version", "prettier@3.4.2"), params.get("filename", "/data/format.md"))
+        return await task_dispatcher.run(task_type, A2, params.get("prettier_version", "prettier@3.4.2"), params.get("filename", "/data/format.md"))
     elif task_type == "A3":
-        return await A3(params.get("filename", "/data/dates.txt"), params.get("targetfile", "/data/dates-wednesdays.txt"))
+        return await task_dispatcher.run(task_type, A3, params.get("filename", "/data/dates.txt"), params.get("targetfile", "/data/dates-wednesdays.txt"), params.get("weekday", "wednesday"))
     elif task_type == "A4":
-        return await A4(params.get("filename", "/data/contacts.json"), params.get("targetfile", "/data/contacts-sorted.json"))
+        return await task_dispatcher.run(task_type, A4, params.get("filename", "/data/contacts.json"), params.get("targetfile", "/data/contacts-sorted.json"))
     elif task_type == "A5":
-        return await A5(params.get("log_dir", "/data/logs"), params.get("output_file", "/data/logs-recent.txt"), params.get("num_files", 10))
+        return await task_dispatcher.run(task_type, A5, params.get("log_dir", "/data/logs"), params.get("output_file", "/data/logs-recent.txt"), params.get("num_files", 10))
     elif task_type == "A6":
-        return await A6(params.get("doc_dir", "/data/docs"), params.get("output_file", "/data/docs/index.json"))
+        return await task_dispatcher.run(task_type, A6, params.get("doc_dir", "/data/docs"), params.get("output_file", "/data/docs/index.json"))
     elif task_type == "A7":
-        return await A7(params.get("filename", "/data/email.txt"), params.get("output_file", "/data/email-sender.txt"))
+        return await task_dispatcher.run(task_type, A7, params.get("filename", "/data/email.txt"), params.get("output_file", "/data/email-sender.txt"), client)
     elif task_type == "A8":
-        return await A8(params.get("image_path", "/data/credit-card.png"), params.get("output_file", "/data/credit-card.txt"))
+        return await task_dispatcher.run(task_type, A8, params.get("image_path", "/data/credit-card.png"), params.get("output_file", "/data/credit-card.txt"), client)
     elif task_type == "A9":
-        return await A9(params.get("filename", "/data/comments.txt"), params.get("output_file", "/data/comments-similar.txt"))
+        return await task_dispatcher.run(task_type, A9, params.get("filename", "/data/comments.txt"), params.get("output_file", "/data/comments-similar.txt"), client, params.get("top_k", 1))
     elif task_type == "A10":
-        return await A10(params.get("db_path", "/data/ticket-sales.db"), params.get("output_file", "/data/ticket-sales-gold.txt"))
+        return await task_dispatcher.run(task_type, A10, params.get("db_path", "/data/ticket-sales.db"), params.get("output_file", "/data/ticket-sales-gold.txt"), params.get("ticket_type", "gold"))
     else:
         raise ValueError(f"Unknown task type: {task_type}")
 
-async def execute_task_b(task_info):
+async def execute_task_b(task_info, client: httpx.AsyncClient = None):
     """Execute Phase B tasks."""
     task_type = task_info["task_type"]
     params = task_info["parameters"]
     
     if task_type == "B3":
-        return await B3(params.get("url"), params.get("save_path", "/data/api_response.json"))
+        return await task_dispatcher.run(task_type, B3, params.get("url"), params.get("save_path", "/data/api_response.json"), client)
     elif task_type == "B5":
-        return await B5(params.get("db_path"), params.get("query"), params.get("output_path", "/data/query_results.json"))
+        return await task_dispatcher.run(task_type, B5, params.get("db_path"), params.get("query"), params.get("output_path", "/data/query_results.json"), params.get("output_format"))
     elif task_type == "B6":
-        return await B6(params.get("url"), params.get("output_path", "/data/scraped_content.txt"))
+        return await task_dispatcher.run(task_type, B6, params.get("url"), params.get("output_path", "/data/scraped_content.txt"), client, params.get("urls"), params.get("depth", 0))
     elif task_type == "B7":
-        return await B7(
+        return await task_dispatcher.run(task_type, B7,
             params.get("image_path"), 
             params.get("output_path", "/data/processed_image.jpg"),
             params.get("width"),
             params.get("height")
         )
     elif task_type == "B9":
-        return await B9(params.get("md_path"), params.get("output_path", "/data/converted.html"))
+        return await task_dispatcher.run(task_type, B9, params.get("md_path"), params.get("output_path", "/data/converted.html"))
     elif task_type == "B10":
-        return await B10(
+        return await task_dispatcher.run(task_type, B10,
             params.get("csv_path"),
             params.get("filter_column"),
             params.get("filter_value"),
@@ -0,0 +1,128 @@
+import asyncio
+import time
+from config import *
+
+# Files each task type reads and writes: task_type -> (inputs, outputs), where
+# each entry is (parameter name, default used by execute_task_a/b)
+TASK_IO = {
+    "A1": ([], [(None, DATA_DIR)]),  # datagen.py writes the whole data directory
+    "A2": ([("filename", "/data/format.md")], [("filename", "/data/format.md")]),
+    "A3": ([("filename", "/data/dates.txt")], [("targetfile", "/data/dates-wednesdays.txt")]),
+    "A4": ([("filename", "/data/contacts.json")], [("targetfile", "/data/contacts-sorted.json")]),
+    "A5": ([("log_dir", "/data/logs")], [("output_file", "/data/logs-recent.txt")]),
+    "A6": ([("doc_dir", "/data/docs")], [("output_file", "/data/docs/index.json")]),
+    "A7": ([("filename", "/data/email.txt")], [("output_file", "/data/email-sender.txt")]),
+    "A8": ([("image_path", "/data/credit-card.png")], [("output_file", "/data/credit-card.txt")]),
+    "A9": ([("filename", "/data/comments.txt")], [("output_file", "/data/comments-similar.txt")]),
+    "A10": ([("db_path", "/data/ticket-sales.db")], [("output_file", "/data/ticket-sales-gold.txt")]),
+    "B3": ([], [("save_path", "/data/api_response.json")]),
+    "B5": ([("db_path", None)], [("output_path", "/data/query_results.json")]),
+    "B6": ([], [("output_path", "/data/scraped_content.txt")]),
+    "B7": ([("image_path", None)], [("output_path", "/data/processed_image.jpg")]),
+    "B9": ([("md_path", None)], [("output_path", "/data/converted.html")]),
+    # B10 converts the JSON next to a missing CSV, so it may write the CSV too
+    "B10": ([("csv_path", None)], [("output_path", "/data/filtered.json"), ("csv_path", None)]),
+}
+
+def task_paths(task_info):
+    """Return the (inputs, outputs) paths a parsed task touches.
+
+    Unparsed tasks and types without known paths (B4, B8) touch nothing, they
+    fail or run on their own without holding up the rest of the batch.
+    """
+    if not isinstance(task_info, dict) or task_info.get("task_type") not in TASK_IO:
+        return [], []
+
+    params = task_info.get("parameters") or {}
+    inputs, outputs = TASK_IO[task_info["task_type"]]
+
+    def resolve(entries):
+        paths = []
+        for name, default in entries:
+            path = params.get(name, default) if name else default
+            if isinstance(path, str) and path:
+                paths.append(os.path.normpath(path))
+        return paths
+
+    return resolve(inputs), resolve(outputs)
+
+def _overlaps(a: str, b: str) -> bool:
+    return a == b or a.startswith(b.rstrip("/") + "/") or b.startswith(a.rstrip("/") + "/")
+
+def _touches(paths_a, paths_b) -> bool:
+    return any(_overlaps(a, b) for a in paths_a for b in paths_b)
+
+def build_plan(task_infos: list) -> list:
+    """Return, for each task, (indexes of earlier tasks it must wait for, those whose outputs it reads).
+
+    A task waits for an earlier one when it reads what that task writes, or
+    writes what that task reads or writes. Only the tasks it reads from need
+    to have succeeded for it to run.
+    """
+    paths = [task_paths(task_info) for task_info in task_infos]
+    plan = []
+    for j, (inputs_j, outputs_j) in enumerate(paths):
+        depends_on = set()
+        reads_from = set()
+        for i in range(j):
+            inputs_i, outputs_i = paths[i]
+            if _touches(inputs_j, outputs_i):
+                reads_from.add(i)
+            elif _touches(outputs_j, inputs_i) or _touches(outputs_j, outputs_i):
+                depends_on.add(i)
+        plan.append((depends_on | reads_from, reads_from))
+    return plan
+
+async def run_plan(task_descriptions: list, task_infos: list, execute, concurrency: int = 8):
+    """Run parsed tasks concurrently in dependency order, yielding results as they finish.
+
+    task_infos entries may be exceptions from parsing; those tasks fail
+    immediately. Tasks reading the outputs of a failed task are skipped.
+    """
+    plan = build_plan([None if isinstance(t, BaseException) else t for t in task_infos])
+    done = [asyncio.Event() for _ in task_infos]
+    succeeded = [False] * len(task_infos)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(index: int):
+        task_info = task_infos[index]
+        result = {
+            "index": index,
+            "task": task_descriptions[index],
+            "task_type": task_info.get("task_type") if isinstance(task_info, dict) else None,
+            "depends_on": sorted(plan[index][0]),
+            "status": None,
+            "result": None,
+            "error": None,
+            "duration": None,
+        }
+        try:
+            depends_on, reads_from = plan[index]
+            for dependency in depends_on:
+                await done[dependency].wait()
+            failed = [d for d in sorted(reads_from) if not succeeded[d]]
+
+            if isinstance(task_info, BaseException):
+                result["status"] = "failed"
+                result["error"] = getattr(task_info, "detail", None) or str(task_info)
+            elif failed:
+                result["status"] = "skipped"
+                result["error"] = f"Depends on failed tasks: {failed}"
+            else:
+                async with semaphore:
+                    start = time.time()
+                    try:
+                        output = await execute(task_info)
+                        result["result"] = output if output is None else str(output)
+                        result["status"] = "succeeded"
+                        succeeded[index] = True
+                    except Exception as e:
+                        result["status"] = "failed"
+                        result["error"] = getattr(e, "detail", None) or str(e)
+                    result["duration"] = time.time() - start
+            return result
+        finally:
+            done[index].set()
+
+    for finished in asyncio.as_completed([run(i) for i in range(len(task_infos))]):
+        yield await finished
@@ -0,0 +1,250 @@
+import re
+from collections import Counter
+from config import *
+
+# How often each parsing path was taken: "classifier" (local templates),
+# "cache" (stored LLM answer), "llm" (single call) or "llm_batch" (batched call)
+TASK_PARSER_STATS = Counter()
+
+DATA_PATH_RE = re.compile(re.escape(DATA_DIR) + r"(?:/[\w.@-]+)*/?")
+URL_RE = re.compile(r"https?://[^\s`'\"<>]+")
+EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+PRETTIER_RE = re.compile(r"prettier@[\w.-]*\w")
+QUOTED_SQL_RE = re.compile(r"(['\"`])((?:SELECT|WITH)\b.*?)\1", re.IGNORECASE | re.DOTALL)
+FILTER_RE = re.compile(r"where\s+`?(\w+)`?\s+(?:equals|is|=|==)\s+['\"]?([^'\"]+?)['\"]?(?:\s+and\b|\s*$|\s*[,.]\s)", re.IGNORECASE)
+PERCENT_RE = re.compile(r"(\d+(?:\.\d+)?)\s*%")
+SIZE_RE = re.compile(r"(\d+)\s*[x×]\s*(\d+)")
+WEEKDAY_RE = re.compile(r"\b((?:mon|tues|wednes|thurs|fri|satur|sun)days?)\b", re.IGNORECASE)
+TICKET_TYPE_RE = re.compile(r"[\"'`](\w[\w -]*)[\"'`]\s+tickets?\b|\b(gold|silver|bronze|platinum)\b", re.IGNORECASE)
+NUM_FILES_RE = re.compile(
+    r"\b(\d+)\s+(?:most\s+)?(?:recent|newest|latest)\b|\b(?:most\s+recent|newest|latest|top)\s+(\d+)\b",
+    re.IGNORECASE
+)
+NUMBER_RE = re.compile(r"\b\d+\b")
+
+# Modifiers that change what a task does. Extractors reject descriptions
+# using them instead of guessing, so the LLM handles those
+LEAST_RE = re.compile(r"\b(?:least|fewest|oldest|earliest|dissimilar|different)\b|\blast line", re.IGNORECASE)
+NEGATION_RE = re.compile(r"\b(?:not|except|excluding|other than|isn't|aren't|doesn't|don't)\b|\bnon-", re.IGNORECASE)
+DESCENDING_RE = re.compile(r"\b(?:descending|reverse|reversed|z to a|z-a)\b", re.IGNORECASE)
+DEPTH_RE = re.compile(r"\bdepth\s+(?:of\s+)?(\d+)\b|\b(\d+)\s+(?:levels?|links?)\s+deep\b", re.IGNORECASE)
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif", ".bmp", ".webp")
+
+def extract_paths(description: str):
+    """Return the /data paths in a description, in order and without duplicates."""
+    paths = []
+    for match in DATA_PATH_RE.finditer(description):
+        path = match.group(0).rstrip(".")
+        if path not in paths:
+            paths.append(path)
+    return paths
+
+def extract_urls(description: str):
+    """Return the http(s) URLs in a description, in order."""
+    return [url.rstrip(".,;:)") for url in URL_RE.findall(description)]
+
+def _numbers(description: str):
+    """Return the numbers in a description outside /data paths and URLs."""
+    text = URL_RE.sub(" ", DATA_PATH_RE.sub(" ", description))
+    return NUMBER_RE.findall(text)
+
+def _files(paths, *extensions):
+    return [p for p in paths if p.lower().endswith(extensions)]
+
+def _dirs(paths):
+    return [p for p in paths if not os.path.splitext(p)[1]]
+
+def _input_output(paths, input_ext=None, output_ext=None):
+    """Split exactly two paths into (input, output), checking extensions when given."""
+    if len(paths) != 2:
+        return None
+    source, target = paths
+    if input_ext and not source.lower().endswith(input_ext):
+        return None
+    if output_ext and not target.lower().endswith(output_ext):
+        return None
+    return source, target
+
+def _a1(description, paths, urls):
+    emails = [e for e in EMAIL_RE.findall(description) if not e.startswith("prettier@")]
+    if len(set(emails)) != 1:
+        return None
+    return {"email": emails[0]}
+
+def _a2(description, paths, urls):
+    versions = PRETTIER_RE.findall(description)
+    files = _files(paths, ".md")
+    if len(set(versions)) != 1 or len(paths) != 1 or len(files) != 1:
+        return None
+    return {"prettier_version": versions[0], "filename": files[0]}
+
+def _a3(description, paths, urls):
+    pair = _input_output(paths)
+    weekdays = {w.lower().rstrip("s") for w in WEEKDAY_RE.findall(description)}
+    if not pair or len(weekdays) != 1 or NEGATION_RE.search(description):
+        return None
+    return {"filename": pair[0], "targetfile": pair[1], "weekday": weekdays.pop()}
+
+def _a4(description, paths, urls):
+    pair = _input_output(paths, ".json", ".json")
+    if not pair or DESCENDING_RE.search(description):
+        return None
+    return {"filename": pair[0], "targetfile": pair[1]}
+
+def _a5(description, paths, urls):
+    dirs = _dirs(paths)
+    files = [p for p in paths if p not in dirs]
+    if len(dirs) != 1 or len(files) != 1 or LEAST_RE.search(description):
+        return None
+    counts = [int(first or second) for first, second in NUM_FILES_RE.findall(description)]
+    numbers = _numbers(description)
+    # Any number other than the file count (e.g. "first 2 lines") is left to the LLM
+    if len(set(counts)) > 1 or len(numbers) != len(counts):
+        return None
+    num_files = counts[0] if counts else 10
+    return {"log_dir": dirs[0].rstrip("/"), "output_file": files[0], "num_files": num_files}
+
+def _a6(description, paths, urls):
+    dirs = _dirs(paths)
+    outputs = _files(paths, ".json")
+    if len(dirs) != 1 or len(outputs) != 1 or len(paths) != 2:
+        return None
+    return {"doc_dir": dirs[0].rstrip("/"), "output_file": outputs[0]}
+
+def _a7(description, paths, urls):
+    pair = _input_output(paths)
+    if not pair:
+        return None
+    return {"filename": pair[0], "output_file": pair[1]}
+
+def _a8(description, paths, urls):
+    pair = _input_output(paths, IMAGE_EXTENSIONS)
+    if not pair:
+        return None
+    return {"image_path": pair[0], "output_file": pair[1]}
+
+def _a9(description, paths, urls):
+    pair = _input_output(paths)
+    if not pair or LEAST_RE.search(description):
+        return None
+    return {"filename": pair[0], "output_file": pair[1]}
+
+def _a10(description, paths, urls):
+    pair = _input_output(paths, ".db")
+    types = {(quoted or named).lower() for quoted, named in TICKET_TYPE_RE.findall(description)}
+    if not pair or len(types) != 1 or NEGATION_RE.search(description):
+        return None
+    return {"db_path": pair[0], "output_file": pair[1], "ticket_type": types.pop()}
+
+def _b3(description, paths, urls):
+    if len(urls) != 1 or len(paths) != 1:
+        return None
+    return {"url": urls[0], "save_path": paths[0]}
+
+def _b5(description, paths, urls):
+    queries = QUOTED_SQL_RE.findall(description)
+    if len(queries) != 1:
+        return None
+    # Paths inside the query itself are not arguments
+    paths = [p for p in paths if p not in queries[0][1]]
+    pair = _input_output(paths)
+    if not pair:
+        return None
+    return {"db_path": pair[0], "query": queries[0][1].strip(), "output_path": pair[1]}
+
+def _b6(description, paths, urls):
+    if not urls or len(paths) != 1:
+        return None
+    params = {"url": urls[0], "output_path": paths[0]}
+    if len(urls) > 1:
+        params["urls"] = urls
+    depth = DEPTH_RE.search(description)
+    if depth:
+        params["depth"] = int(depth.group(1) or depth.group(2))
+    return params
+
+def _b7(description, paths, urls):
+    pair = _input_output(paths, IMAGE_EXTENSIONS, IMAGE_EXTENSIONS)
+    if not pair:
+        return None
+    percents = PERCENT_RE.findall(description)
+    sizes = SIZE_RE.findall(description)
+    if len(percents) == 1 and not sizes:
+        width = height = f"{percents[0]}%"
+    elif len(sizes) == 1 and not percents:
+        width, height = sizes[0]
+    else:
+        return None
+    return {"image_path": pair[0], "output_path": pair[1], "width": width, "height": height}
+
+def _b9(description, paths, urls):
+    pair = _input_output(paths, ".md", (".html", ".htm"))
+    if not pair:
+        return None
+    return {"md_path": pair[0], "output_path": pair[1]}
+
+def _b10(description, paths, urls):
+    pair = _input_output(paths, ".csv", ".json")
+    matches = FILTER_RE.findall(description)
+    if not pair or len(matches) != 1 or NEGATION_RE.search(description):
+        return None
+    column, value = matches[0]
+    return {"csv_path": pair[0], "filter_column": column, "filter_value": value.strip(), "output_path": pair[1]}
+
+# (task_type, keyword patterns, parameter extractor)
+# A template's confidence is the fraction of its keyword patterns found in the
+# description; it is zero whenever the extractor cannot pin down the parameters
+# or finds a modifier it doesn't handle.
+TASK_TEMPLATES = [
+    ("A1", [r"datagen\.py", r"\b(run|execute)\b", r"\bargument\b"], _a1),
+    ("A2", [r"\bprettier\b", r"\bformat", r"\bmarkdown\b|\.md\b"], _a2),
+    ("A3", [r"\bdates?\b", WEEKDAY_RE.pattern, r"\bcount\b|\bnumber of\b"], _a3),
+    ("A4", [r"\bsort", r"\bcontacts\b", r"last_name|last name"], _a4),
+    ("A5", [r"\.log\b", r"\brecent\b|\bnewest\b|\blatest\b", r"\bfirst line\b"], _a5),
+    ("A6", [r"\bmarkdown\b|\.md\b", r"\bh1\b|# ", r"\bindex\b"], _a6),
+    ("A7", [r"\bemail\b", r"\bsender", r"\baddress\b"], _a7),
+    ("A8", [r"\bcredit[ _-]?card\b", r"\bcard number\b", r"\bimage\b|\.png\b"], _a8),
+    ("A9", [r"\bcomments?\b", r"\bembeddings?\b", r"\bsimilar\b"], _a9),
+    ("A10", [r"\bticket", r"\bgold\b|\bsilver\b|\bbronze\b|\bplatinum\b|\bticket type\b", r"\btotal sales\b|\bsales\b"], _a10),
+    ("B3", [r"\bfetch\b|\bdownload\b", r"\bapi\b", r"\bsave\b"], _b3),
+    ("B5", [r"\bsql\b|\bquery\b", r"\bdatabase\b|\.db\b|\.duckdb\b", r"\bjson\b|\bsave\b"], _b5),
+    ("B6", [r"\bextract\b|\bscrape\b|\bcrawl", r"\bh1\b|\bheading\b|\bwebsite\b|\bcontent\b|\bpages\b", r"\bsave\b|\bwrite\b"], _b6),
+    ("B7", [r"\bresize\b|\bcompress\b", r"\bimage\b", r"\bsave\b"], _b7),
+    ("B9", [r"\bmarkdown\b", r"\bhtml\b", r"\bconvert\b"], _b9),
+    ("B10", [r"\bcsv\b", r"\bfilter\b", r"\bjson\b"], _b10),
+]
+
+COMPILED_TEMPLATES = [
+    (task_type, [re.compile(p, re.IGNORECASE) for p in patterns], extractor)
+    for task_type, patterns, extractor in TASK_TEMPLATES
+]
+
+def classify_task(description: str):
+    """Match a description against the local task templates.
+
+    Returns (task_info, confidence). task_info is None when no template matched
+    or when the best match is tied with another task type.
+    """
+    paths = extract_paths(description)
+    urls = extract_urls(description)
+
+    candidates = []
+    for task_type, patterns, extractor in COMPILED_TEMPLATES:
+        matched = sum(1 for pattern in patterns if pattern.search(description))
+        if not matched:
+            continue
+        params = extractor(description, paths, urls)
+        if params is None:
+            continue
+        candidates.append((matched / len(patterns), task_type, params))
+
+    if not candidates:
+        return None, 0.0
+
+    candidates.sort(key=lambda c: c[0], reverse=True)
+    confidence, task_type, params = candidates[0]
+    if len(candidates) > 1 and candidates[1][0] == confidence:
+        return None, 0.0
+
+    return {"task_type": task_type, "parameters": params}, confidence
@@ -1,5 +1,6 @@
 from dotenv import load_dotenv
 import os
+import tempfile
 from pathlib import Path
 
 # Load environment variables from .env file
@@ -23,6 +24,134 @@ OPENAI_API_BASE_URL = os.getenv("OPENAI_API_BASE_URL", "https://aiproxy.sanand.w
 # OPENAI_API_BASE_URL = os.getenv("OPENAI_API_BASE_URL", "https://openrouter.ai/api/v1")
 OPENAI_CHAT_URL = f"{OPENAI_API_BASE_URL}/chat/completions"
 OPENAI_EMBEDDINGS_URL = f"{OPENAI_API_BASE_URL}/embeddings"
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+
+# Embedding Request Configuration
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "2048"))
+EMBEDDING_BATCH_TOKENS = int(os.getenv("EMBEDDING_BATCH_TOKENS", "100000"))
+EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", "4"))
+EMBEDDING_MAX_RETRIES = int(os.getenv("EMBEDDING_MAX_RETRIES", "3"))
+EMBEDDING_RETRY_BACKOFF = float(os.getenv("EMBEDDING_RETRY_BACKOFF", "1.0"))
+
+# Similarity Search Configuration
+SIMILARITY_BLOCK_SIZE = int(os.getenv("SIMILARITY_BLOCK_SIZE", "1024"))
+SIMILARITY_WORKERS = int(os.getenv("SIMILARITY_WORKERS", "1"))
+
+# HTTP Client Configuration
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "1") == "1"
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "60"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "10"))
+
+# B3 Download Configuration (0 disables the size limit and overall timeout)
+DOWNLOAD_MAX_BYTES = int(os.getenv("DOWNLOAD_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
+DOWNLOAD_TIMEOUT = float(os.getenv("DOWNLOAD_TIMEOUT", "0"))
+DOWNLOAD_READ_TIMEOUT = float(os.getenv("DOWNLOAD_READ_TIMEOUT", "60"))
+DOWNLOAD_CHUNK_SIZE = int(os.getenv("DOWNLOAD_CHUNK_SIZE", str(64 * 1024)))
+DOWNLOAD_RESUME = os.getenv("DOWNLOAD_RESUME", "1") == "1"
+DOWNLOAD_COMPRESSION = os.getenv("DOWNLOAD_COMPRESSION", "1") == "1"
+
+# B6 Crawler Configuration (host rate is requests per second per host, 0 disables it)
+CRAWL_CONCURRENCY = int(os.getenv("CRAWL_CONCURRENCY", "16"))
+CRAWL_HOST_RATE = float(os.getenv("CRAWL_HOST_RATE", "5"))
+CRAWL_MAX_PAGES = int(os.getenv("CRAWL_MAX_PAGES", "10000"))
+CRAWL_MAX_BYTES = int(os.getenv("CRAWL_MAX_BYTES", str(10 * 1024 * 1024)))
+CRAWL_CACHE_ENABLED = os.getenv("CRAWL_CACHE_ENABLED", "1") == "1"
+CRAWL_CACHE_MAX_ENTRIES = int(os.getenv("CRAWL_CACHE_MAX_ENTRIES", "100000"))
+
+# Task Parser Configuration
+CLASSIFIER_ENABLED = os.getenv("CLASSIFIER_ENABLED", "1") == "1"
+CLASSIFIER_MIN_CONFIDENCE = float(os.getenv("CLASSIFIER_MIN_CONFIDENCE", "1.0"))
+
+# Job Queue Configuration
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "8"))
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "1000"))
+JOB_HISTORY_SIZE = int(os.getenv("JOB_HISTORY_SIZE", "10000"))
+JOB_TYPE_LIMITS = os.getenv("JOB_TYPE_LIMITS", "A2:1,A8:2,A9:2")
+
+# Batch Configuration
+BATCH_MAX_TASKS = int(os.getenv("BATCH_MAX_TASKS", "1000"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+
+# Task Execution Configuration (inline, thread or process per task type)
+TASK_EXECUTION_MODES = os.getenv(
+    "TASK_EXECUTION_MODES",
+    "A1:thread,A2:thread,A3:process,A4:thread,A5:thread,A6:thread,A10:thread,B5:thread,B7:process,B9:thread,B10:process"
+)
+TASK_THREAD_WORKERS = int(os.getenv("TASK_THREAD_WORKERS", "16"))
+TASK_PROCESS_WORKERS = int(os.getenv("TASK_PROCESS_WORKERS", str(os.cpu_count() or 1)))
+
+# Prettier Configuration
+PRETTIER_WORKERS = int(os.getenv("PRETTIER_WORKERS", "1"))
+PRETTIER_WARMUP_VERSION = os.getenv("PRETTIER_WARMUP_VERSION", "prettier@3.4.2")
+PRETTIER_TIMEOUT = float(os.getenv("PRETTIER_TIMEOUT", "30"))
+
+# Streaming Input Configuration
+STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", str(1024 * 1024)))
+STREAM_MMAP_THRESHOLD = int(os.getenv("STREAM_MMAP_THRESHOLD", str(64 * 1024 * 1024)))
+STREAM_BATCH_LINES = int(os.getenv("STREAM_BATCH_LINES", "100000"))
+
+# A4 Sort Configuration (auto, memory or external)
+A4_SORT_MODE = os.getenv("A4_SORT_MODE", "auto")
+A4_MEMORY_LIMIT = int(os.getenv("A4_MEMORY_LIMIT", str(256 * 1024 * 1024)))
+EXTERNAL_SORT_RUN_SIZE = int(os.getenv("EXTERNAL_SORT_RUN_SIZE", "200000"))
+EXTERNAL_SORT_DIR = os.getenv("EXTERNAL_SORT_DIR", "")
+
+# A5 Log Configuration
+LOG_READ_CONCURRENCY = int(os.getenv("LOG_READ_CONCURRENCY", "16"))
+LOG_INDEX_ENABLED = os.getenv("LOG_INDEX_ENABLED", "0") == "1"
+
+# A6 Index Configuration
+DOC_INDEX_ENABLED = os.getenv("DOC_INDEX_ENABLED", "1") == "1"
+DOC_SCAN_WORKERS = int(os.getenv("DOC_SCAN_WORKERS", "16"))
+DOC_READ_CHUNK_SIZE = int(os.getenv("DOC_READ_CHUNK_SIZE", str(64 * 1024)))
+
+# A7 Email Configuration
+EMAIL_LLM_CONCURRENCY = int(os.getenv("EMAIL_LLM_CONCURRENCY", "4"))
+
+# A8 Image Upload Configuration
+IMAGE_MAX_UPLOAD_BYTES = int(os.getenv("IMAGE_MAX_UPLOAD_BYTES", "0"))
+IMAGE_MAX_SIDE = int(os.getenv("IMAGE_MAX_SIDE", "0"))
+IMAGE_CROP = os.getenv("IMAGE_CROP", "0") == "1"
+IMAGE_GRAYSCALE = os.getenv("IMAGE_GRAYSCALE", "0") == "1"
+
+# A8 OCR Configuration (template, tesseract or none)
+OCR_BACKEND = os.getenv("OCR_BACKEND", "template")
+OCR_MIN_CONFIDENCE = float(os.getenv("OCR_MIN_CONFIDENCE", "0.9"))
+
+# SQLite Read Configuration
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_KB = int(os.getenv("SQLITE_CACHE_KB", str(64 * 1024)))
+
+# Database Connection Pool Configuration
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "32"))
+DB_POOL_IDLE_TIMEOUT = float(os.getenv("DB_POOL_IDLE_TIMEOUT", "300"))
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "256"))
+DB_READ_ONLY = os.getenv("DB_READ_ONLY", "1") == "1"
+
+# A10 Aggregate Configuration (index, summary or scan)
+A10_STRATEGY = os.getenv("A10_STRATEGY", "index")
+
+# B5 Query Export Configuration (0 disables the row limit and timeout)
+B5_FETCH_SIZE = int(os.getenv("B5_FETCH_SIZE", "10000"))
+B5_MAX_ROWS = int(os.getenv("B5_MAX_ROWS", "0"))
+B5_TIMEOUT = float(os.getenv("B5_TIMEOUT", "0"))
+
+# B5 Result Cache Configuration (hard links share the inode with outputs, so in-place edits reach the cache)
+B5_CACHE_ENABLED = os.getenv("B5_CACHE_ENABLED", "1") == "1"
+B5_CACHE_MAX_BYTES = int(os.getenv("B5_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
+B5_CACHE_MAX_ENTRIES = int(os.getenv("B5_CACHE_MAX_ENTRIES", "1000"))
+B5_CACHE_LINK = os.getenv("B5_CACHE_LINK", "0") == "1"
+
+# Cache Configuration
+CACHE_DIR = os.getenv("CACHE_DIR", "/tmp/tds-cache")
+TASK_CACHE_ENABLED = os.getenv("TASK_CACHE_ENABLED", "1") == "1"
+TASK_CACHE_MEMORY_SIZE = int(os.getenv("TASK_CACHE_MEMORY_SIZE", "1024"))
+TASK_CACHE_DISK_SIZE = int(os.getenv("TASK_CACHE_DISK_SIZE", "100000"))
+TASK_CACHE_TTL = float(os.getenv("TASK_CACHE_TTL", str(7 * 24 * 60 * 60)))
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "1") == "1"
 
 # Create data directory if it doesn't exist
 Path(REAL_DATA_DIR).mkdir(parents=True, exist_ok=True)
@@ -39,3 +168,28 @@ def ensure_data_path(path: str) -> None:
     """Ensure that a path is within the data directory."""
     if not path.startswith(DATA_DIR):
         raise ValueError(f"Access denied. Can only access files under {DATA_DIR}")
+
+def write_atomic(path: str, content: str, encoding: str = "utf-8") -> None:
+    """Write a text file via a temporary file and rename, so readers never see a partial file."""
+    directory = os.path.dirname(path) or "."
+    fd, temp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding=encoding) as f:
+            f.write(content)
+        # mkstemp creates the file private, keep the usual permissions
+        os.chmod(temp_path, os.stat(path).st_mode & 0o777 if os.path.exists(path) else 0o644)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+def parse_type_map(value: str, convert=str) -> dict:
+    """Parse per-task-type settings like "A2:1,A8:2" into {"A2": convert("1"), ...}."""
+    settings = {}
+    for item in value.split(","):
+        if not item.strip():
+            continue
+        task_type, setting = item.split(":")
+        settings[task_type.strip().upper()] = convert(setting.strip())
+    return settings
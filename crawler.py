@@ -0,0 +1,267 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from collections import Counter
+from email.utils import parsedate_to_datetime
+from urllib.parse import urldefrag, urljoin, urlsplit
+import httpx
+from bs4 import BeautifulSoup
+from config import *
+
+def parse_page(html: str, base_url: str):
+    """Return (title, text, links) of an HTML page, with links made absolute and unfragmented."""
+    soup = BeautifulSoup(html, 'html.parser')
+    title = soup.title.get_text(strip=True) if soup.title else None
+    links = []
+    for anchor in soup.find_all('a', href=True):
+        link = urldefrag(urljoin(base_url, anchor['href'])).url
+        if urlsplit(link).scheme in ("http", "https"):
+            links.append(link)
+    return title, soup.get_text(), links
+
+def freshness(headers: httpx.Headers) -> float:
+    """Seconds a response may be reused without revalidating, or -1 if it must not be stored."""
+    directives = {}
+    for directive in headers.get("cache-control", "").lower().split(","):
+        name, _, value = directive.strip().partition("=")
+        if name:
+            directives[name] = value.strip('"')
+    if "no-store" in directives:
+        return -1
+    if "no-cache" in directives:
+        return 0
+    try:
+        if "max-age" in directives:
+            return max(int(directives["max-age"]) - int(headers.get("age", 0)), 0)
+        if "expires" in headers:
+            date = parsedate_to_datetime(headers["date"]).timestamp() if "date" in headers else time.time()
+            return max(parsedate_to_datetime(headers["expires"]).timestamp() - date, 0)
+    except (ValueError, TypeError):
+        return 0
+    return 0
+
+class HttpCache:
+    """SQLite store of fetched pages, reused while fresh and revalidated with ETag/Last-Modified after."""
+
+    def __init__(self, cache_dir: str, max_entries: int = 100000):
+        self.max_entries = max_entries
+        self.stats = Counter()
+        self.lock = threading.Lock()
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(cache_dir, "http_cache.sqlite3"), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                final_url TEXT NOT NULL,
+                content_type TEXT,
+                etag TEXT,
+                last_modified TEXT,
+                body BLOB NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS pages_accessed_at ON pages (accessed_at)")
+        self.conn.commit()
+
+    def get(self, url: str):
+        """Return the cached entry for a URL as a dict, or None."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT final_url, content_type, etag, last_modified, body, expires_at FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                return None
+            self.conn.execute("UPDATE pages SET accessed_at = ? WHERE url = ?", (time.time(), url))
+            self.conn.commit()
+        final_url, content_type, etag, last_modified, body, expires_at = row
+        return {
+            "final_url": final_url,
+            "content_type": content_type,
+            "etag": etag,
+            "last_modified": last_modified,
+            "text": zlib.decompress(body).decode("utf-8"),
+            "expires_at": expires_at,
+        }
+
+    def put(self, url: str, response: httpx.Response, text: str):
+        """Store a 200 response unless it forbids it or could never be reused."""
+        ttl = freshness(response.headers)
+        etag = response.headers.get("etag")
+        last_modified = response.headers.get("last-modified")
+        if ttl < 0 or (ttl == 0 and not etag and not last_modified):
+            return
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, str(response.url), response.headers.get("content-type"), etag, last_modified,
+                 zlib.compress(text.encode("utf-8")), now + ttl, now)
+            )
+            count = self.conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+            if count > self.max_entries:
+                self.conn.execute(
+                    "DELETE FROM pages WHERE url IN (SELECT url FROM pages ORDER BY accessed_at LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+                self.stats["evictions"] += count - self.max_entries
+            self.conn.commit()
+            self.stats["stores"] += 1
+
+    def refresh(self, url: str, response: httpx.Response):
+        """Extend a cached entry after a 304."""
+        with self.lock:
+            self.conn.execute(
+                "UPDATE pages SET expires_at = ? WHERE url = ?", (time.time() + max(freshness(response.headers), 0), url)
+            )
+            self.conn.commit()
+
+    def get_stats(self) -> dict:
+        """Return hit/revalidation counters and the number of stored pages."""
+        with self.lock:
+            entries = self.conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+            return {**self.stats, "entries": entries}
+
+_http_cache = None
+_http_cache_lock = threading.Lock()
+
+def get_http_cache():
+    """Return the shared crawler HTTP cache under CACHE_DIR, or None when disabled."""
+    global _http_cache
+    if not CRAWL_CACHE_ENABLED:
+        return None
+    with _http_cache_lock:
+        if _http_cache is None:
+            _http_cache = HttpCache(os.path.join(CACHE_DIR, "crawl"), CRAWL_CACHE_MAX_ENTRIES)
+        return _http_cache
+
+class HostRateLimiter:
+    """Spaces out request starts to each host to at most rate per second (0 disables it)."""
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate if rate else 0
+        self.next_slot = {}  # host -> earliest start of its next request
+
+    async def wait(self, host: str):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        slot = max(now, self.next_slot.get(host, now))
+        self.next_slot[host] = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+async def read_body(response: httpx.Response, url: str, max_bytes: int) -> str:
+    """Read and decode a streamed body, failing once it passes max_bytes (0 disables the cap)."""
+    expected = response.headers.get("content-length")
+    encoded = response.headers.get("content-encoding", "identity").lower() != "identity"
+    if max_bytes and expected and expected.isdigit() and not encoded and int(expected) > max_bytes:
+        raise Exception(f"Failed to fetch {url}: larger than {max_bytes} bytes")
+    chunks = []
+    size = 0
+    async for chunk in response.aiter_bytes():
+        size += len(chunk)
+        if max_bytes and size > max_bytes:
+            raise Exception(f"Failed to fetch {url}: larger than {max_bytes} bytes")
+        chunks.append(chunk)
+    return b"".join(chunks).decode(response.encoding or "utf-8", errors="replace")
+
+async def fetch_page(client: httpx.AsyncClient, url: str, limiter: HostRateLimiter, cache: HttpCache = None,
+                     max_bytes: int = CRAWL_MAX_BYTES):
+    """Fetch a page through the cache. Returns (record, links).
+
+    SQLite and HTML parsing run in worker threads so they don't stall the other fetches.
+    """
+    cached = await asyncio.to_thread(cache.get, url) if cache is not None else None
+    if cached is not None and cached["expires_at"] > time.time():
+        cache.stats["hits"] += 1
+        status, final_url, content_type, text, source = 200, cached["final_url"], cached["content_type"], cached["text"], "cache"
+    else:
+        headers = {}
+        if cached is not None:
+            if cached["etag"]:
+                headers["If-None-Match"] = cached["etag"]
+            if cached["last_modified"]:
+                headers["If-Modified-Since"] = cached["last_modified"]
+        await limiter.wait(urlsplit(url).netloc)
+        async with client.stream("GET", url, headers=headers, follow_redirects=True) as response:
+            if response.status_code == 304 and cached is not None:
+                text = None
+            else:
+                text = await read_body(response, url, max_bytes)
+        if text is None:
+            await asyncio.to_thread(cache.refresh, url, response)
+            cache.stats["revalidated"] += 1
+            status, final_url, content_type, text, source = 200, cached["final_url"], cached["content_type"], cached["text"], "revalidated"
+        else:
+            status, final_url, content_type, source = (
+                response.status_code, str(response.url), response.headers.get("content-type"), "network"
+            )
+            if cache is not None:
+                cache.stats["misses"] += 1
+                if status == 200:
+                    await asyncio.to_thread(cache.put, url, response, text)
+
+    record = {"url": url, "final_url": final_url, "status": status, "source": source}
+    links = []
+    if status == 200:
+        if content_type is None or "html" in content_type:
+            record["title"], record["text"], links = await asyncio.to_thread(parse_page, text, final_url)
+        else:
+            record["title"], record["text"] = None, text
+    return record, links
+
+async def crawl(client: httpx.AsyncClient, seeds: list, output, max_depth: int = 0,
+                concurrency: int = CRAWL_CONCURRENCY, max_pages: int = CRAWL_MAX_PAGES,
+                host_rate: float = CRAWL_HOST_RATE, cache: HttpCache = None,
+                max_bytes: int = CRAWL_MAX_BYTES) -> Counter:
+    """Fetch seed URLs and, up to max_depth links away, pages they link to on the same hosts.
+
+    Each page is written to the text file output as one JSON line in the
+    order pages finish; failures become {"url", "depth", "error"} lines.
+    Pages over max_bytes are failures. Returns counts of pages fetched and
+    failed (errors and non-200 statuses).
+    """
+    limiter = HostRateLimiter(host_rate)
+    hosts = {urlsplit(url).netloc for url in seeds}
+    queue = asyncio.Queue()
+    seen = set()
+    counts = Counter()
+    for url in seeds:
+        url = urldefrag(url).url
+        if url not in seen and len(seen) < max_pages:
+            seen.add(url)
+            queue.put_nowait((url, 0))
+
+    async def worker():
+        while True:
+            url, depth = await queue.get()
+            try:
+                record, links = await fetch_page(client, url, limiter, cache, max_bytes)
+                record["depth"] = depth
+                counts["pages" if record["status"] == 200 else "errors"] += 1
+            except Exception as e:
+                record, links = {"url": url, "depth": depth, "error": str(e)}, []
+                counts["errors"] += 1
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+            if depth < max_depth:
+                for link in links:
+                    if link not in seen and urlsplit(link).netloc in hosts and len(seen) < max_pages:
+                        seen.add(link)
+                        queue.put_nowait((link, depth + 1))
+            queue.task_done()
+
+    workers = [asyncio.create_task(worker()) for _ in range(max(concurrency, 1))]
+    try:
+        await queue.join()
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+    return counts
@@ -0,0 +1,122 @@
+import re
+from functools import lru_cache
+from dateutil import parser
+import pandas as pd
+from config import *
+
+# Unambiguous formats tried in bulk before falling back to dateutil, including
+# the ones datagen's get_dates emits
+KNOWN_DATE_FORMATS = [
+    "%Y-%m-%d",
+    "%d-%b-%Y",
+    "%b %d, %Y",
+    "%Y/%m/%d %H:%M:%S",
+    "%Y/%m/%d",
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%dT%H:%M:%S",
+    "%d %b %Y",
+    "%B %d, %Y",
+    "%d-%B-%Y",
+]
+
+# Regex fragments for the strftime directives used above
+DIRECTIVE_PATTERNS = {
+    "Y": r"\d{4}",
+    "m": r"\d{1,2}",
+    "d": r"\d{1,2}",
+    "H": r"\d{1,2}",
+    "M": r"\d{1,2}",
+    "S": r"\d{1,2}",
+    "b": r"[A-Za-z]{3}",
+    "B": r"[A-Za-z]+",
+}
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+def parse_weekday(value) -> int:
+    """Turn a weekday name ("Wednesday", "wed", "wednesdays") or number (0 = Monday) into 0-6."""
+    if isinstance(value, int) or str(value).isdigit():
+        weekday = int(value)
+        if not 0 <= weekday <= 6:
+            raise ValueError(f"Weekday must be between 0 and 6: {value}")
+        return weekday
+
+    name = str(value).strip().lower()
+    for i, weekday in enumerate(WEEKDAYS):
+        if name in (weekday, weekday + "s") or (len(name) >= 3 and weekday.startswith(name)):
+            return i
+    raise ValueError(f"Unknown weekday: {value}")
+
+@lru_cache(maxsize=None)
+def format_pattern(date_format: str) -> str:
+    """Regex matching the shape of strings produced by a strftime format."""
+    pattern = ""
+    for token in re.findall(r"%\w|[^%]+", date_format):
+        pattern += DIRECTIVE_PATTERNS[token[1]] if token.startswith("%") else re.escape(token)
+    return pattern
+
+def detect_formats(lines, sample_size: int = 1000):
+    """Return the known formats found in a sample of lines, most common first."""
+    sample = pd.Series(lines[:sample_size], dtype=object).str.strip()
+    hits = []
+    for date_format in KNOWN_DATE_FORMATS:
+        count = sample.str.fullmatch(format_pattern(date_format)).sum()
+        if count:
+            hits.append((count, date_format))
+    return [date_format for _, date_format in sorted(hits, key=lambda hit: -hit[0])]
+
+def parse_dates(lines, formats: list = None):
+    """Parse date strings in bulk.
+
+    Lines are routed to each detected format by a vectorized regex match on
+    their shape and converted in bulk; only lines no format matched go through
+    dateutil. Returns (dates, unparsed) where dates is a datetime Series of the
+    parsed lines.
+    """
+    series = pd.Series(lines, dtype=object).str.strip()
+    series = series[series != ""]
+    if formats is None:
+        formats = detect_formats(series.head(1000).tolist())
+
+    parsed_parts = []
+    remaining = series
+    for date_format in formats:
+        if remaining.empty:
+            break
+        # Only convert lines of the right shape, coercing them is much slower
+        shaped = remaining.str.fullmatch(format_pattern(date_format)).astype(bool)
+        parsed = pd.to_datetime(remaining[shaped], format=date_format, errors="coerce")
+        matched = parsed.notna()
+        parsed_parts.append(parsed[matched])
+        remaining = pd.concat([remaining[~shaped], remaining[shaped][~matched]])
+
+    # Anything else goes through dateutil one line at a time
+    leftovers = {}
+    for index, text in remaining.items():
+        try:
+            leftovers[index] = pd.Timestamp(parser.parse(text).replace(tzinfo=None))
+        except (ValueError, OverflowError, pd.errors.OutOfBoundsDatetime):
+            continue
+    if leftovers:
+        parsed_parts.append(pd.Series(leftovers, dtype="datetime64[ns]"))
+
+    if parsed_parts:
+        dates = pd.concat(parsed_parts).sort_index()
+    else:
+        dates = pd.Series([], dtype="datetime64[ns]")
+    return dates, len(series) - len(dates)
+
+def count_dates(lines, predicate, formats: list = None):
+    """Count parsed dates matching a vectorized predicate on a datetime Series.
+
+    Returns (count, unparsed).
+    """
+    dates, unparsed = parse_dates(lines, formats)
+    if dates.empty:
+        return 0, unparsed
+    return int(predicate(dates).sum()), unparsed
+
+def count_weekday(lines, weekday) -> tuple:
+    """Count dates falling on a weekday (name or 0-6). Returns (count, unparsed)."""
+    weekday = parse_weekday(weekday)
+    return count_dates(lines, lambda dates: dates.dt.weekday == weekday)
@@ -0,0 +1,140 @@
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+import duckdb
+from config import *
+
+def open_sqlite(path: str, read_only: bool = True) -> sqlite3.Connection:
+    """Open an SQLite database with a memory-mapped page cache, read-only by default."""
+    mode = "ro" if read_only else "rw"
+    conn = sqlite3.connect(
+        f"{Path(path).resolve().as_uri()}?mode={mode}", uri=True,
+        check_same_thread=False, cached_statements=DB_STATEMENT_CACHE_SIZE
+    )
+    conn.execute(f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE}")
+    conn.execute(f"PRAGMA cache_size = -{SQLITE_CACHE_KB}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    if read_only:
+        conn.execute("PRAGMA query_only = 1")
+    return conn
+
+def open_duckdb(path: str, read_only: bool = True):
+    """Open a DuckDB database, read-only by default."""
+    return duckdb.connect(path, read_only=read_only)
+
+class _Handle:
+    def __init__(self, conn, signature):
+        self.conn = conn
+        self.signature = signature
+        self.last_used = time.monotonic()
+        self.users = 0
+        self.retired = False
+
+class ConnectionPool:
+    """LRU of open database handles, reopened when the database file changes.
+
+    SQLite handles are per thread. A DuckDB database has one shared handle and
+    each use gets its own cursor on it, sharing the buffer manager. Handles are
+    keyed by real path and closed once the file's inode or mtime changes, when
+    they fall out of the LRU, or after idle_timeout seconds unused, so a
+    read-only DuckDB handle doesn't block writers in other processes forever.
+    Handles in use are only closed when released.
+    """
+
+    def __init__(self, max_handles: int = 32, idle_timeout: float = 300):
+        self.max_handles = max_handles
+        self.idle_timeout = idle_timeout
+        self.handles = OrderedDict()  # key -> _Handle
+        self.stats = Counter()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _signature(path: str):
+        stat = os.stat(path)
+        return (stat.st_ino, stat.st_mtime_ns)
+
+    def _retire(self, key):
+        handle = self.handles.pop(key)
+        handle.retired = True
+        if handle.users == 0:
+            handle.conn.close()
+
+    def _acquire(self, key, path: str, opener):
+        signature = self._signature(path)
+        now = time.monotonic()
+        with self.lock:
+            for other, handle in list(self.handles.items()):
+                stale = other[1] == path and handle.signature != signature
+                idle = self.idle_timeout and handle.users == 0 and now - handle.last_used > self.idle_timeout
+                if stale or idle:
+                    self._retire(other)
+                    self.stats["invalidated" if stale else "expired"] += 1
+
+            handle = self.handles.get(key)
+            if handle is None:
+                handle = _Handle(opener(), signature)
+                self.handles[key] = handle
+                self.stats["opened"] += 1
+            else:
+                self.stats["hits"] += 1
+            self.handles.move_to_end(key)
+            handle.users += 1
+            handle.last_used = now
+
+            # Close the least recently used handles that nobody is using
+            for other in list(self.handles):
+                if len(self.handles) <= self.max_handles:
+                    break
+                if other != key and self.handles[other].users == 0:
+                    self._retire(other)
+                    self.stats["evicted"] += 1
+            return handle
+
+    def _release(self, handle: _Handle):
+        with self.lock:
+            handle.users -= 1
+            handle.last_used = time.monotonic()
+            if handle.retired and handle.users == 0:
+                handle.conn.close()
+
+    @contextmanager
+    def sqlite(self, path: str, read_only: bool = DB_READ_ONLY):
+        """Yield this thread's pooled connection to an SQLite database."""
+        path = os.path.realpath(path)
+        key = ("sqlite", path, read_only, threading.get_ident())
+        handle = self._acquire(key, path, lambda: open_sqlite(path, read_only))
+        try:
+            yield handle.conn
+        finally:
+            self._release(handle)
+
+    @contextmanager
+    def duckdb(self, path: str, read_only: bool = DB_READ_ONLY):
+        """Yield a cursor on the shared pooled connection to a DuckDB database."""
+        path = os.path.realpath(path)
+        key = ("duckdb", path, read_only)
+        handle = self._acquire(key, path, lambda: open_duckdb(path, read_only))
+        try:
+            cursor = handle.conn.cursor()
+            try:
+                yield cursor
+            finally:
+                cursor.close()
+        finally:
+            self._release(handle)
+
+    def get_stats(self) -> dict:
+        """Return open handle count and hit/open/eviction counters."""
+        with self.lock:
+            return {"open": len(self.handles), **self.stats}
+
+    def close(self):
+        """Close every handle that isn't in use, and the rest once released."""
+        with self.lock:
+            for key in list(self.handles):
+                self._retire(key)
+
+db_pool = ConnectionPool(DB_POOL_SIZE, DB_POOL_IDLE_TIMEOUT)
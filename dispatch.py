@@ -0,0 +1,68 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import httpx
+from config import *
+
+EXECUTION_MODES = ("inline", "thread", "process")
+
+def _run_coroutine(func, args):
+    """Run a task coroutine to completion on a fresh event loop in a worker."""
+    return asyncio.run(func(*args))
+
+class TaskDispatcher:
+    """Run task functions inline, in a thread pool or in a process pool by task type.
+
+    Task bodies do blocking file, database and subprocess work, so running them
+    in a worker keeps the event loop free for other requests.
+    """
+
+    def __init__(self, modes: dict = None, thread_workers: int = 8, process_workers: int = 2):
+        for task_type, mode in (modes or {}).items():
+            if mode not in EXECUTION_MODES:
+                raise ValueError(f"Unknown execution mode for {task_type}: {mode}")
+        self.modes = modes or {}
+        self.thread_workers = thread_workers
+        self.process_workers = process_workers
+        self.thread_pool = None
+        self.process_pool = None
+
+    def _executor(self, mode: str):
+        # Pools are created on first use so idle types cost nothing
+        if mode == "thread":
+            if self.thread_pool is None:
+                self.thread_pool = ThreadPoolExecutor(max_workers=self.thread_workers, thread_name_prefix="task")
+            return self.thread_pool
+        if self.process_pool is None:
+            # spawn, as forking a process with running threads can deadlock
+            self.process_pool = ProcessPoolExecutor(
+                max_workers=self.process_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self.process_pool
+
+    async def run(self, task_type: str, func, *args):
+        """Run a task function with the execution mode configured for its type."""
+        mode = self.modes.get(task_type, "inline")
+        if mode == "inline":
+            return await func(*args)
+
+        # Shared clients belong to this event loop, so workers open their own
+        args = tuple(None if isinstance(arg, httpx.AsyncClient) else arg for arg in args)
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._executor(mode), _run_coroutine, func, args)
+        except BrokenProcessPool:
+            # A crashed worker breaks the whole pool, start a fresh one next time
+            self.process_pool = None
+            raise
+
+    def shutdown(self):
+        """Shut down any worker pools that were started."""
+        if self.thread_pool is not None:
+            self.thread_pool.shutdown(wait=False, cancel_futures=True)
+            self.thread_pool = None
+        if self.process_pool is not None:
+            self.process_pool.shutdown(wait=False, cancel_futures=True)
+            self.process_pool = None
@@ -0,0 +1,136 @@
+import hashlib
+import json
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from config import *
+
+# Bump when the title rules change so old manifests are rebuilt
+MANIFEST_VERSION = 1
+
+def _find_h1(block: bytes):
+    # A line is a heading when it is whitespace, "# " and a non-empty title,
+    # the same as line.strip().startswith('# ') on the decoded line
+    start = block.find(b"# ")
+    while start != -1:
+        line_start = max(block.rfind(b"\n", 0, start), block.rfind(b"\r", 0, start)) + 1
+        line_end = len(block)
+        for newline in (b"\n", b"\r"):
+            end = block.find(newline, start)
+            if end != -1:
+                line_end = min(line_end, end)
+        if not block[line_start:start].decode('utf-8').strip():
+            title = block[start + 2:line_end].decode('utf-8').strip()
+            if title:
+                return title
+        start = block.find(b"# ", line_end)
+    return None
+
+def first_h1(path: str, chunk_size: int = DOC_READ_CHUNK_SIZE):
+    """Return the text of the first "# " heading in a markdown file, or None.
+
+    Reads fixed-size chunks and searches complete lines as bytes, stopping at
+    the first heading.
+    """
+    with open(path, 'rb') as f:
+        pending = b""
+        while True:
+            chunk = f.read(chunk_size)
+            data = pending + chunk
+            if chunk:
+                cut = max(data.rfind(b"\n"), data.rfind(b"\r"))
+                if cut == -1:
+                    pending = data
+                    continue
+                block, pending = data[:cut + 1], data[cut + 1:]
+            else:
+                block = data
+            title = _find_h1(block)
+            if title is not None or not chunk:
+                return title
+
+def _scan_directory(path: str, relative: str):
+    # Same classification as os.walk: symlinked directories are not followed
+    subdirectories = []
+    files = {}
+    with os.scandir(path) as entries:
+        for entry in entries:
+            name = os.path.join(relative, entry.name) if relative else entry.name
+            if entry.is_dir():
+                if not entry.is_symlink():
+                    subdirectories.append((entry.path, name))
+            elif entry.name.endswith('.md'):
+                stat = entry.stat()
+                files[name] = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+    return subdirectories, files
+
+def scan_markdown(directory: str, executor: ThreadPoolExecutor = None) -> dict:
+    """Return {relative path: (mtime_ns, size, inode)} for every .md file under directory.
+
+    Subdirectories are listed concurrently on executor, or on a pool of
+    DOC_SCAN_WORKERS threads when none is given.
+    """
+    if executor is None:
+        with ThreadPoolExecutor(max_workers=DOC_SCAN_WORKERS) as executor:
+            return scan_markdown(directory, executor)
+
+    files = {}
+    pending = {executor.submit(_scan_directory, directory, "")}
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            subdirectories, found = future.result()
+            files.update(found)
+            pending |= {executor.submit(_scan_directory, *subdirectory) for subdirectory in subdirectories}
+    return files
+
+def manifest_path(directory: str) -> str:
+    """Sidecar manifest location for a docs directory, under CACHE_DIR."""
+    key = hashlib.sha256(os.path.realpath(directory).encode("utf-8")).hexdigest()
+    return os.path.join(CACHE_DIR, "doc_index", f"{key}.json")
+
+def load_manifest(directory: str) -> dict:
+    """Return {relative path: [mtime_ns, size, inode, title]} from the last run, or {}."""
+    try:
+        with open(manifest_path(directory), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+    if manifest.get("version") != MANIFEST_VERSION or manifest.get("directory") != os.path.realpath(directory):
+        return {}
+    return manifest["files"]
+
+def save_manifest(directory: str, files: dict) -> None:
+    path = manifest_path(directory)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    manifest = {"version": MANIFEST_VERSION, "directory": os.path.realpath(directory), "files": files}
+    write_atomic(path, json.dumps(manifest))
+
+def build_index(directory: str, incremental: bool = True) -> dict:
+    """Return {relative path: title} for markdown files with an H1, sorted by path.
+
+    With incremental set, files whose (mtime, size, inode) match the manifest
+    from the previous run are not read again.
+    """
+    previous = load_manifest(directory) if incremental else {}
+    files = {}
+    changed = []
+    with ThreadPoolExecutor(max_workers=DOC_SCAN_WORKERS) as executor:
+        for relative_path, signature in scan_markdown(directory, executor).items():
+            entry = previous.get(relative_path)
+            if entry is not None and tuple(entry[:3]) == signature:
+                files[relative_path] = entry
+            else:
+                files[relative_path] = list(signature)
+                changed.append(relative_path)
+
+        # Overlap the opens, per-file latency dominates on network filesystems
+        paths = [os.path.join(directory, relative_path) for relative_path in changed]
+        for relative_path, title in zip(changed, executor.map(first_h1, paths)):
+            files[relative_path].append(title)
+    reread = len(changed)
+
+    if incremental:
+        save_manifest(directory, files)
+        removed = len(set(previous) - set(files))
+        print(f"Doc index for {directory}: {reread} read, {len(files) - reread} unchanged, {removed} removed")  # Debug log
+
+    return {path: entry[3] for path, entry in sorted(files.items()) if entry[3] is not None}
@@ -0,0 +1,153 @@
+import hashlib
+import json
+import re
+import time
+import httpx
+from config import *
+
+CONTENT_RANGE_RE = re.compile(r"bytes (\d+)-(\d+)/(\d+|\*)")
+
+def metadata_path(path: str) -> str:
+    """Sidecar file under CACHE_DIR holding validators for a downloaded file."""
+    digest = hashlib.sha256(os.path.realpath(path).encode("utf-8")).hexdigest()
+    return os.path.join(CACHE_DIR, "downloads", f"{digest}.json")
+
+def partial_path(path: str) -> str:
+    """Where an interrupted download of path is kept for resuming."""
+    return os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.part")
+
+def load_metadata(path: str) -> dict:
+    try:
+        with open(metadata_path(path)) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def save_metadata(path: str, metadata: dict) -> None:
+    os.makedirs(os.path.dirname(metadata_path(path)), exist_ok=True)
+    write_atomic(metadata_path(path), json.dumps(metadata))
+
+def _validator(response: httpx.Response):
+    """A validator usable with If-Range: a strong ETag, else Last-Modified."""
+    etag = response.headers.get("etag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return response.headers.get("last-modified")
+
+def _unchanged(path: str, metadata: dict) -> bool:
+    """Whether path is still the file the metadata describes."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return False
+    return stat.st_size == metadata.get("size") and stat.st_mtime_ns == metadata.get("mtime_ns")
+
+def _request_headers(url: str, path: str, metadata: dict, offset: int, compress: bool) -> dict:
+    headers = {}
+    saved = metadata.get("saved", {})
+    if saved.get("url") == url and _unchanged(path, saved):
+        if saved.get("etag"):
+            headers["If-None-Match"] = saved["etag"]
+        if saved.get("last_modified"):
+            headers["If-Modified-Since"] = saved["last_modified"]
+    if offset:
+        # Ranges count encoded bytes, so a resumed download is never compressed
+        headers["Range"] = f"bytes={offset}-"
+        headers["If-Range"] = metadata["partial"]["validator"]
+        headers["Accept-Encoding"] = "identity"
+    elif not compress:
+        headers["Accept-Encoding"] = "identity"
+    return headers
+
+async def download(client: httpx.AsyncClient, url: str, path: str, max_bytes: int = DOWNLOAD_MAX_BYTES,
+                   resume: bool = DOWNLOAD_RESUME, compress: bool = DOWNLOAD_COMPRESSION,
+                   timeout: float = DOWNLOAD_TIMEOUT) -> str:
+    """Stream url to path. Returns "not_modified", "resumed" or "downloaded".
+
+    The body goes to a partial file that is renamed over path once complete.
+    The previous response's ETag/Last-Modified are kept in a sidecar under
+    CACHE_DIR and sent back, so an unchanged resource (304) leaves path alone.
+    An interrupted uncompressed download is resumed with a Range request if the
+    server gave a validator for If-Range. max_bytes (0 disables it) caps the
+    decoded size; timeout (0 disables it) caps the whole transfer in seconds.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    metadata = load_metadata(path)
+    part = partial_path(path)
+
+    partial = metadata.get("partial")
+    offset = 0
+    if resume and partial and partial.get("url") == url and os.path.exists(part):
+        offset = os.path.getsize(part)
+
+    deadline = time.monotonic() + timeout if timeout else None
+    headers = _request_headers(url, path, metadata, offset, compress)
+    async with client.stream("GET", url, headers=headers,
+                             timeout=httpx.Timeout(DOWNLOAD_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT)) as response:
+        if response.status_code == 304:
+            return "not_modified"
+
+        if response.status_code == 416 and offset:
+            # The resource shrank or the partial file is bad, start over
+            await response.aclose()
+            os.remove(part)
+            metadata.pop("partial", None)
+            save_metadata(path, metadata)
+            return await download(client, url, path, max_bytes, resume, compress, timeout)
+
+        if response.status_code == 206 and offset:
+            match = CONTENT_RANGE_RE.fullmatch(response.headers.get("content-range", ""))
+            if not match or int(match.group(1)) != offset:
+                os.remove(part)
+                metadata.pop("partial", None)
+                save_metadata(path, metadata)
+                raise Exception(f"Failed to resume {url}: unexpected Content-Range")
+            mode = "ab"
+        elif response.status_code == 200:
+            offset = 0
+            mode = "wb"
+        else:
+            raise Exception(f"Failed to fetch data from {url}: HTTP {response.status_code}")
+
+        expected = response.headers.get("content-length")
+        encoded = response.headers.get("content-encoding", "identity").lower() != "identity"
+        if max_bytes and expected and not encoded and offset + int(expected) > max_bytes:
+            raise Exception(f"Failed to fetch data from {url}: larger than {max_bytes} bytes")
+
+        # Only identity bodies with a validator can be resumed byte for byte
+        validator = _validator(response)
+        resumable = resume and not encoded and validator is not None
+        if resumable:
+            metadata["partial"] = {"url": url, "validator": validator}
+        else:
+            metadata.pop("partial", None)
+        save_metadata(path, metadata)
+
+        size = offset
+        complete = False
+        try:
+            with open(part, mode) as f:
+                async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                    size += len(chunk)
+                    if max_bytes and size > max_bytes:
+                        resumable = False
+                        raise Exception(f"Failed to fetch data from {url}: larger than {max_bytes} bytes")
+                    if deadline and time.monotonic() > deadline:
+                        raise Exception(f"Failed to fetch data from {url}: took longer than {timeout} seconds")
+                    f.write(chunk)
+            complete = True
+        finally:
+            if not complete and not resumable and os.path.exists(part):
+                os.remove(part)
+
+    os.replace(part, path)
+    stat = os.stat(path)
+    metadata = {"saved": {
+        "url": url,
+        "etag": response.headers.get("etag"),
+        "last_modified": response.headers.get("last-modified"),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+    }}
+    save_metadata(path, metadata)
+    return "resumed" if offset else "downloaded"
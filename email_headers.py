@@ -0,0 +1,52 @@
+import re
+from email import policy
+from email.parser import Parser
+from config import *
+
+ADDRESS_RE = re.compile(r"[^@\s<>\"]+@[^@\s<>\"]+\.[^@\s<>\".]+")
+
+_parser = Parser(policy=policy.default)
+
+def _addresses(message, header: str):
+    """Return the addresses in a header ([] if absent), or None if it is malformed."""
+    values = message.get_all(header) or []
+    if not values:
+        return []
+    if len(values) > 1:
+        return None
+    try:
+        value = values[0]
+        if value.defects:
+            return None
+        addresses = [address.addr_spec for address in value.addresses]
+    except Exception:
+        return None
+    if not all(ADDRESS_RE.fullmatch(address) for address in addresses):
+        return None
+    return list(dict.fromkeys(addresses))
+
+def sender_address(content: str):
+    """Return the sender address from RFC 822 headers, or None when it is not unambiguous.
+
+    From wins when it names a single mailbox. With several authors in From the
+    Sender header names the sender; without From, Sender then Reply-To is used.
+    Encoded words (=?utf-8?q?...?=) in display names are decoded by the parser.
+    """
+    try:
+        message = _parser.parsestr(content, headersonly=True)
+    except Exception:
+        return None
+
+    from_addresses = _addresses(message, "From")
+    if from_addresses is None:
+        return None
+    if len(from_addresses) == 1:
+        return from_addresses[0]
+
+    for header in ("Sender",) if from_addresses else ("Sender", "Reply-To"):
+        addresses = _addresses(message, header)
+        if addresses is None:
+            return None
+        if len(addresses) == 1:
+            return addresses[0]
+    return None
@@ -0,0 +1,267 @@
+import asyncio
+import fcntl
+import hashlib
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import httpx
+import numpy as np
+from config import *
+
+def text_hash(text: str) -> str:
+    """Content hash used to key stored embeddings."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for batching (about 4 characters per token)."""
+    return len(text) // 4 + 1
+
+def make_batches(texts: list, max_tokens: int = EMBEDDING_BATCH_TOKENS, max_inputs: int = EMBEDDING_BATCH_SIZE):
+    """Split texts into consecutive batches within the token and input limits."""
+    batches = []
+    batch, batch_tokens = [], 0
+    for text in texts:
+        tokens = estimate_tokens(text)
+        if batch and (batch_tokens + tokens > max_tokens or len(batch) >= max_inputs):
+            batches.append(batch)
+            batch, batch_tokens = [], 0
+        batch.append(text)
+        batch_tokens += tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
+async def _fetch_batch(client: httpx.AsyncClient, texts: list, model: str, max_retries: int):
+    """Request embeddings for one batch, retrying rate limits and server errors."""
+    for attempt in range(max_retries + 1):
+        try:
+            response = await client.post(
+                OPENAI_EMBEDDINGS_URL,
+                headers={"Authorization": f"Bearer {AIPROXY_TOKEN}"},
+                json={
+                    "model": model,
+                    "input": texts
+                }
+            )
+        except httpx.TransportError as e:
+            error = str(e)
+        else:
+            if response.status_code == 200:
+                result = response.json()
+                data = sorted(result["data"], key=lambda item: item.get("index", 0))
+                return [item["embedding"] for item in data]
+            error = response.text
+            # Other client errors won't succeed on retry
+            if response.status_code != 429 and response.status_code < 500:
+                break
+
+        if attempt < max_retries:
+            await asyncio.sleep(EMBEDDING_RETRY_BACKOFF * 2 ** attempt)
+
+    raise Exception(f"Failed to get embeddings: {error}")
+
+async def fetch_embeddings(client: httpx.AsyncClient, texts: list, model: str = EMBEDDING_MODEL,
+                           concurrency: int = EMBEDDING_CONCURRENCY, max_retries: int = EMBEDDING_MAX_RETRIES):
+    """Request embeddings for texts from the embeddings API, in input order.
+
+    Texts are split into batches by estimated token count and the batches are
+    sent concurrently, at most `concurrency` at a time.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch(batch):
+        async with semaphore:
+            return await _fetch_batch(client, batch, model, max_retries)
+
+    results = await asyncio.gather(*(fetch(batch) for batch in make_batches(texts)))
+    return [embedding for result in results for embedding in result]
+
+class EmbeddingStore:
+    """Persistent embeddings keyed by (model, sha256(text)).
+
+    Vectors are appended as float32 rows to a flat file that is memory-mapped
+    for reads; an SQLite index maps text hashes to row numbers.
+    """
+
+    def __init__(self, cache_dir: str, model: str = EMBEDDING_MODEL):
+        self.model = model
+        self.directory = os.path.join(cache_dir, model.replace("/", "_"))
+        os.makedirs(self.directory, exist_ok=True)
+        self.vectors_path = os.path.join(self.directory, "vectors.f32")
+        self.lock_path = os.path.join(self.directory, "store.lock")
+        self.lock = threading.Lock()
+
+        self.conn = sqlite3.connect(os.path.join(self.directory, "index.sqlite3"), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS embeddings (hash TEXT PRIMARY KEY, row INTEGER NOT NULL)")
+        self.conn.commit()
+
+    @contextmanager
+    def _file_lock(self):
+        """Serialize appends across threads and processes sharing the store."""
+        with self.lock, open(self.lock_path, "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _dim(self):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'dim'").fetchone()
+        return int(row[0]) if row else None
+
+    def lookup(self, hashes: list) -> dict:
+        """Return {hash: row} for the hashes that are already stored."""
+        rows = {}
+        unique = list(dict.fromkeys(hashes))
+        # Stay well below SQLite's bound parameter limit
+        for start in range(0, len(unique), 500):
+            chunk = unique[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows.update(self.conn.execute(
+                f"SELECT hash, row FROM embeddings WHERE hash IN ({placeholders})", chunk
+            ).fetchall())
+        return rows
+
+    def add(self, hashes: list, vectors):
+        """Append vectors for new hashes to the store."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if len(hashes) != len(vectors):
+            raise ValueError("Number of hashes and vectors must match")
+        if not len(hashes):
+            return
+
+        with self._file_lock():
+            dim = self._dim()
+            if dim is None:
+                dim = vectors.shape[1]
+                self.conn.execute("INSERT INTO meta (key, value) VALUES ('dim', ?)", (str(dim),))
+            elif vectors.shape[1] != dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match store dimension {dim}")
+
+            # Another writer may have stored some of these in the meantime
+            existing = self.lookup(hashes)
+            new = {}
+            for h, vector in zip(hashes, vectors):
+                if h not in existing and h not in new:
+                    new[h] = vector
+            if not new:
+                self.conn.commit()
+                return
+
+            # Drop any partial row left behind by an interrupted write
+            row_bytes = dim * 4
+            size = os.path.getsize(self.vectors_path) if os.path.exists(self.vectors_path) else 0
+            next_row = size // row_bytes
+
+            with open(self.vectors_path, "ab") as f:
+                f.truncate(next_row * row_bytes)
+                f.write(np.stack(list(new.values())).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+
+            self.conn.executemany(
+                "INSERT INTO embeddings (hash, row) VALUES (?, ?)",
+                [(h, next_row + i) for i, h in enumerate(new)]
+            )
+            self.conn.commit()
+
+    def load(self, rows: list):
+        """Return the vectors for rows as an (N, dim) float32 array.
+
+        Consecutive ascending rows are returned as a view on the memory map
+        without copying.
+        """
+        dim = self._dim()
+        total_rows = os.path.getsize(self.vectors_path) // (dim * 4)
+        matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(total_rows, dim))
+
+        if rows and rows[-1] - rows[0] == len(rows) - 1 and all(b - a == 1 for a, b in zip(rows, rows[1:])):
+            return matrix[rows[0]:rows[-1] + 1]
+        return np.asarray(matrix[rows])
+
+    async def ensure(self, client: httpx.AsyncClient, texts: list) -> list:
+        """Store embeddings for texts not stored yet and return the row of each text."""
+        hashes = [text_hash(text) for text in texts]
+        known = self.lookup(hashes)
+
+        missing = {}
+        for h, text in zip(hashes, texts):
+            if h not in known and h not in missing:
+                missing[h] = text
+
+        if missing:
+            print(f"Embedding {len(missing)} new texts, {len(texts) - len(missing)} cached")  # Debug log
+            vectors = await fetch_embeddings(client, list(missing.values()), self.model)
+            self.add(list(missing.keys()), vectors)
+            known = self.lookup(hashes)
+
+        return [known[h] for h in hashes]
+
+    async def embed(self, client: httpx.AsyncClient, texts: list):
+        """Return embeddings for texts, only requesting the ones not stored yet."""
+        return self.load(await self.ensure(client, texts))
+
+_stores = {}
+
+def get_embedding_store(model: str = EMBEDDING_MODEL) -> EmbeddingStore:
+    """Return the shared store for a model under CACHE_DIR."""
+    if model not in _stores:
+        _stores[model] = EmbeddingStore(os.path.join(CACHE_DIR, "embeddings"), model)
+    return _stores[model]
+
+def _top_candidates(sims, top_k: int, row_offset: int, col_offset: int):
+    """Return up to top_k (similarity, i, j) entries from a tile, keeping ties."""
+    flat = sims.ravel()
+    valid = flat > -np.inf
+    if not valid.any():
+        return []
+    k = min(top_k, int(valid.sum()))
+    threshold = np.partition(flat, flat.size - k)[flat.size - k]
+    idx = np.nonzero(valid & (flat >= threshold))[0]
+    rows, cols = np.divmod(idx, sims.shape[1])
+    return [(float(flat[x]), row_offset + int(r), col_offset + int(c)) for x, r, c in zip(idx, rows, cols)]
+
+def _best(candidates, top_k: int):
+    # Highest similarity first, ties broken by (i, j) like argmax over the full matrix
+    return sorted(candidates, key=lambda c: (-c[0], c[1], c[2]))[:top_k]
+
+def most_similar_pairs(embeddings, top_k: int = 1, block_size: int = SIMILARITY_BLOCK_SIZE, workers: int = SIMILARITY_WORKERS):
+    """Return the top_k most cosine-similar pairs as [(similarity, i, j)] with i < j.
+
+    The normalized float32 vectors are multiplied tile by tile over the upper
+    triangle, keeping a running top_k, so memory stays at block_size x block_size
+    instead of the full N x N matrix. Inputs that fit in a single tile are
+    compared in float64 so near-ties resolve exactly like cdist.
+    """
+    n = len(embeddings)
+    if n < 2:
+        raise ValueError("Need at least 2 vectors to find similar pairs")
+    vectors = np.asarray(embeddings, dtype=np.float64 if n <= block_size else np.float32)
+
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    vectors = vectors / norms
+
+    def search_rows(row_start: int):
+        row_stop = min(row_start + block_size, n)
+        best = []
+        for col_start in range(row_start, n, block_size):
+            col_stop = min(col_start + block_size, n)
+            sims = vectors[row_start:row_stop] @ vectors[col_start:col_stop].T
+            if col_start == row_start:
+                # Only pairs with j > i
+                sims[np.tril_indices(row_stop - row_start, m=col_stop - col_start)] = -np.inf
+            best = _best(best + _top_candidates(sims, top_k, row_start, col_start), top_k)
+        return best
+
+    row_starts = range(0, n, block_size)
+    if workers > 1 and len(row_starts) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(search_rows, row_starts))
+    else:
+        results = [search_rows(start) for start in row_starts]
+
+    return _best([c for result in results for c in result], top_k)
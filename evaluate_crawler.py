@@ -0,0 +1,163 @@
+# /// script
+# requires-python = ">=3.11"
+# dependencies = [
+#     "beautifulsoup4",
+#     "httpx",
+#     "python-dotenv",
+# ]
+# ///
+import asyncio
+import io
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# config.py insists on a token, the crawler never uses it
+os.environ.setdefault("AIPROXY_TOKEN", "unused")
+
+import httpx
+from crawler import HttpCache, crawl
+
+
+class SiteHandler(BaseHTTPRequestHandler):
+    """Serves /p/<n> pages linking to /p/<2n+1>, /p/<2n+2>, another host and a large page.
+
+    Pages carry an ETag and Cache-Control: no-cache, so a second crawl through
+    the cache must revalidate every page and get 304s back.
+    """
+
+    other_host = None
+    requests = []
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.requests.append((self.path, self.headers.get("If-None-Match")))
+        if self.path == "/big":
+            body = b"x" * 4096
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain")
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        n = int(self.path.rsplit("/", 1)[-1])
+        etag = f'"page-{n}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        body = (
+            f"<html><title>Page {n}</title><body>"
+            f"<a href='/p/{2 * n + 1}'>left</a> <a href='/p/{2 * n + 2}#top'>right</a> "
+            f"<a href='{self.other_host}/p/{n}'>elsewhere</a>"
+            "</body></html>"
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class OtherHandler(SiteHandler):
+    requests = []
+
+
+def serve(handler):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+async def run_crawl(client, seeds, cache=None, max_depth=0, max_bytes=0):
+    output = io.StringIO()
+    counts = await crawl(client, seeds, output, max_depth=max_depth, host_rate=0, cache=cache, max_bytes=max_bytes)
+    return counts, [json.loads(line) for line in output.getvalue().splitlines()]
+
+
+async def depth_and_hosts(client, base, cache):
+    """Depth 2 from /p/0 reaches /p/0 to /p/6 and never leaves the seed's host"""
+    counts, records = await run_crawl(client, [base + "/p/0"], cache, max_depth=2)
+    depths = Counter(record["depth"] for record in records)
+    urls = sorted(record["url"] for record in records)
+    expected = sorted(f"{base}/p/{n}" for n in range(7))
+    if counts != Counter(pages=7) or depths != Counter({0: 1, 1: 2, 2: 4}) or urls != expected:
+        logging.error(f"🔴 Unexpected crawl: {counts} {depths} {urls}")
+        return False
+    if OtherHandler.requests:
+        logging.error(f"🔴 Crawler left the seed's host: {OtherHandler.requests}")
+        return False
+    return all(record["source"] == "network" and record["title"].startswith("Page") for record in records)
+
+
+async def revalidation(client, base, cache):
+    """A second crawl revalidates every cached page with If-None-Match and gets 304s"""
+    SiteHandler.requests.clear()
+    counts, records = await run_crawl(client, [base + "/p/0"], cache, max_depth=2)
+    sources = Counter(record["source"] for record in records)
+    if counts != Counter(pages=7) or sources != Counter(revalidated=7):
+        logging.error(f"🔴 Unexpected revalidation: {counts} {sources}")
+        return False
+    if not all(etag for _, etag in SiteHandler.requests):
+        logging.error(f"🔴 Requests without If-None-Match: {SiteHandler.requests}")
+        return False
+    return all(record["title"].startswith("Page") for record in records)
+
+
+async def size_cap(client, base, cache):
+    """A body over max_bytes is recorded as an error"""
+    counts, records = await run_crawl(client, [base + "/big", base + "/p/0"], max_bytes=1024)
+    errors = [record for record in records if "error" in record]
+    if counts != Counter(pages=1, errors=1) or len(errors) != 1 or errors[0]["url"] != base + "/big":
+        logging.error(f"🔴 Unexpected size cap result: {counts} {records}")
+        return False
+    return True
+
+
+async def main():
+    other_server, SiteHandler.other_host = serve(OtherHandler)
+    server, base = serve(SiteHandler)
+    score, total = 0, 0
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = HttpCache(cache_dir)
+            async with httpx.AsyncClient(timeout=10) as client:
+                for check in [depth_and_hosts, revalidation, size_cap]:
+                    total += 1
+                    try:
+                        success = await check(client, base, cache)
+                    except Exception as e:
+                        logging.error(f"🔴 {check.__name__} failed: {e}")
+                        success = False
+                    if success:
+                        logging.info(f"✅ {check.__name__}: {check.__doc__}")
+                    else:
+                        logging.error(f"❌ {check.__name__} FAILED")
+                    score += 1 if success else 0
+            cache.conn.close()
+    finally:
+        server.shutdown()
+        other_server.shutdown()
+    logging.info(f"\n🎯 Final Score: {score} / {total}")
+    return score == total
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Check the B6 crawler against a local HTTP server")
+    levels = ["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]
+    parser.add_argument("--log-level", default="INFO", choices=levels, help="Set logging level")
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level, format="%(message)s\n")
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    sys.exit(0 if asyncio.run(main()) else 1)
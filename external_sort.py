@@ -0,0 +1,122 @@
+import heapq
+import json
+import re
+import tempfile
+from config import *
+
+# orjson is optional, it only speeds up parsing and spilling
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+WHITESPACE_RE = re.compile(r"\s*")
+
+def loads(data):
+    """Parse JSON text or bytes, with orjson when available."""
+    return orjson.loads(data) if orjson else json.loads(data)
+
+def iter_json_array(path: str, chunk_size: int = STREAM_CHUNK_SIZE):
+    """Yield the elements of a top-level JSON array without loading the whole file."""
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        buffer = ""
+        position = 0
+        eof = False
+
+        def read_more() -> bool:
+            nonlocal buffer, position, eof
+            chunk = f.read(chunk_size)
+            if not chunk:
+                eof = True
+                return False
+            buffer = buffer[position:] + chunk
+            position = 0
+            return True
+
+        def next_char():
+            nonlocal position
+            while True:
+                position = WHITESPACE_RE.match(buffer, position).end()
+                if position < len(buffer):
+                    return buffer[position]
+                if not read_more():
+                    return None
+
+        if next_char() != "[":
+            raise ValueError(f"Expected a JSON array in {path}")
+        position += 1
+        if next_char() == "]":
+            return
+
+        while True:
+            # A value is only complete once its separator is in the buffer, a
+            # number cut off at the end of a chunk would otherwise decode short
+            while True:
+                try:
+                    value, end = decoder.raw_decode(buffer, position)
+                    following = WHITESPACE_RE.match(buffer, end).end()
+                    if eof or (following < len(buffer) and buffer[following] in ",]"):
+                        break
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                read_more()
+            position = end
+            yield value
+
+            separator = next_char()
+            position += 1
+            if separator == "]":
+                return
+            if separator != ",":
+                raise ValueError(f"Malformed JSON array in {path}")
+            next_char()
+
+def write_json_array(records, f, default=None):
+    """Write records as a JSON array formatted exactly like json.dump(records, f, indent=2)."""
+    first = True
+    for record in records:
+        f.write("[\n  " if first else ",\n  ")
+        f.write(json.dumps(record, indent=2, default=default).replace("\n", "\n  "))
+        first = False
+    f.write("[]" if first else "\n]")
+
+def _spill(records: list, directory: str) -> str:
+    with tempfile.NamedTemporaryFile("wb", dir=directory, suffix=".run", delete=False) as f:
+        for record in records:
+            f.write(orjson.dumps(record) if orjson else json.dumps(record).encode())
+            f.write(b"\n")
+        return f.name
+
+def _read_run(path: str):
+    with open(path, 'rb') as f:
+        for line in f:
+            yield loads(line)
+
+def external_sort(records, key, run_size: int = EXTERNAL_SORT_RUN_SIZE, spill_dir: str = None):
+    """Stable sort of an iterable of JSON values in bounded memory.
+
+    Records are sorted in runs of run_size, spilled to temporary files as JSON
+    lines and k-way merged. Inputs that fit in a single run never touch disk.
+    """
+    with tempfile.TemporaryDirectory(prefix="sort-", dir=spill_dir or None) as directory:
+        runs = []
+        run = []
+        for record in records:
+            run.append(record)
+            if len(run) >= run_size:
+                run.sort(key=key)
+                runs.append(_spill(run, directory))
+                run = []
+        run.sort(key=key)
+
+        if not runs:
+            yield from run
+            return
+        if run:
+            runs.append(_spill(run, directory))
+            run = []
+
+        # heapq.merge prefers earlier runs on ties, which keeps the sort stable
+        yield from heapq.merge(*[_read_run(path) for path in runs], key=key)
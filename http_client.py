@@ -0,0 +1,28 @@
+import importlib.util
+from contextlib import asynccontextmanager
+import httpx
+from config import *
+
+def create_http_client() -> httpx.AsyncClient:
+    """Create a pooled AsyncClient for LLM and HTTP calls."""
+    limits = httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    )
+    timeout = httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT)
+
+    # HTTP/2 needs the optional h2 package, fall back to HTTP/1.1 without it
+    http2 = HTTP2_ENABLED and importlib.util.find_spec("h2") is not None
+
+    return httpx.AsyncClient(http2=http2, limits=limits, timeout=timeout)
+
+@asynccontextmanager
+async def use_client(client: httpx.AsyncClient = None):
+    """Yield the injected client, or a short-lived one when called standalone."""
+    if client is not None:
+        yield client
+        return
+
+    async with create_http_client() as temp_client:
+        yield temp_client
@@ -0,0 +1,66 @@
+import base64
+from io import BytesIO
+from PIL import Image, ImageChops
+from config import *
+
+# Modes PNG stores as they are
+PNG_MODES = {'1', 'L', 'LA', 'I', 'I;16', 'P', 'RGB', 'RGBA'}
+
+def crop_to_content(image: Image.Image, padding: int = 16, threshold: int = 32) -> Image.Image:
+    """Crop away the margins that match the background colour.
+
+    The top-left pixel is taken as the background, so an image whose corner
+    is content (or a gradient) may be cropped wrongly; hence opt-in.
+    """
+    rgb = image.convert('RGB')
+    background = Image.new('RGB', rgb.size, rgb.getpixel((0, 0)))
+    # Ignore noise and gradients below the threshold when looking for content
+    diff = ImageChops.difference(rgb, background).convert('L').point(lambda value: 255 if value > threshold else 0)
+    box = diff.getbbox()
+    if box is None:
+        return image
+    left, top, right, bottom = box
+    return image.crop((
+        max(left - padding, 0), max(top - padding, 0),
+        min(right + padding, image.width), min(bottom + padding, image.height)
+    ))
+
+def prepare_image(image: Image.Image, crop: bool = IMAGE_CROP, grayscale: bool = IMAGE_GRAYSCALE,
+                  max_side: int = IMAGE_MAX_SIDE) -> Image.Image:
+    """Shrink an image for upload: crop to its content, drop colour and cap the longest side.
+
+    With every option off the pixels are left as they are.
+    """
+    if grayscale:
+        image = image.convert('L')
+    elif image.mode not in PNG_MODES:
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+    else:
+        # Detach from the file, which the caller may close
+        image = image.copy()
+    if crop:
+        image = crop_to_content(image)
+    if max_side and max(image.size) > max_side:
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+    return image
+
+def encode_png(image: Image.Image, max_bytes: int = IMAGE_MAX_UPLOAD_BYTES) -> bytes:
+    """Encode an image as PNG in memory, downscaling until it fits in max_bytes."""
+    while True:
+        buffer = BytesIO()
+        image.save(buffer, format='PNG', optimize=True)
+        data = buffer.getvalue()
+        if not max_bytes or len(data) <= max_bytes:
+            return data
+        width, height = image.size
+        if min(width, height) <= 64:
+            raise Exception(f"Image can't be encoded under {max_bytes} bytes")
+        image = image.resize((int(width * 0.75), int(height * 0.75)), Image.LANCZOS)
+
+def image_data_url(path: str, **options) -> str:
+    """Return a base64 PNG data URL for an image file, prepared for upload without temporary files."""
+    max_bytes = options.pop('max_bytes', IMAGE_MAX_UPLOAD_BYTES)
+    with Image.open(path) as image:
+        prepared = prepare_image(image, **options)
+    data = encode_png(prepared, max_bytes)
+    return f"data:image/png;base64,{base64.b64encode(data).decode('utf-8')}"
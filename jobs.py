@@ -0,0 +1,136 @@
+import asyncio
+import time
+import uuid
+from collections import Counter, OrderedDict, deque
+from config import *
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at capacity."""
+
+class JobQueue:
+    """Bounded pool of workers running submitted task descriptions in the background.
+
+    `parse` turns a description into task info and `execute` runs it. Each task
+    type may have its own concurrency limit on top of the worker count. A job
+    whose type is at its limit is parked rather than holding a worker, and
+    started by the worker that finishes the next job of that type.
+    """
+
+    def __init__(self, parse, execute, workers: int = 8, type_limits: dict = None,
+                 max_queued: int = 1000, max_history: int = 10000):
+        self.parse = parse
+        self.execute = execute
+        self.workers = workers
+        self.type_limits = type_limits or {}
+        self.max_queued = max_queued
+        self.max_history = max_history
+        self.queue = asyncio.Queue()
+        self.jobs = OrderedDict()
+        self.running = Counter()  # task_type -> jobs executing
+        self.parked = {}  # task_type -> deque of (job, task_info) waiting for a slot
+        self.worker_tasks = []
+
+    def start(self):
+        """Start the worker tasks on the running event loop."""
+        self.worker_tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Cancel the workers, abandoning queued jobs."""
+        for task in self.worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self.worker_tasks, return_exceptions=True)
+        self.worker_tasks = []
+
+    def submit(self, task_description: str) -> dict:
+        """Queue a task description and return its job record."""
+        job = {
+            "id": uuid.uuid4().hex,
+            "task": task_description,
+            "status": "queued",
+            "task_type": None,
+            "submitted_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "duration": None,
+            "result": None,
+            "error": None,
+        }
+        if self._waiting() >= self.max_queued:
+            raise QueueFullError(f"Job queue is full ({self.max_queued} jobs)")
+        self.queue.put_nowait(job)
+
+        self.jobs[job["id"]] = job
+        # Forget the oldest finished jobs beyond the history limit
+        while len(self.jobs) > self.max_history:
+            oldest_id, oldest = next(iter(self.jobs.items()))
+            if oldest["status"] in ("queued", "running"):
+                break
+            del self.jobs[oldest_id]
+        return job
+
+    def get(self, job_id: str):
+        """Return the job record for an id, or None."""
+        return self.jobs.get(job_id)
+
+    def get_stats(self) -> dict:
+        """Return job counts by status and the current queue length."""
+        counts = {}
+        for job in self.jobs.values():
+            counts[job["status"]] = counts.get(job["status"], 0) + 1
+        return {"queued": self._waiting(), "parked": dict(self._parked_counts()), "jobs": counts}
+
+    def _parked_counts(self):
+        return {task_type: len(jobs) for task_type, jobs in self.parked.items() if jobs}
+
+    def _waiting(self) -> int:
+        return self.queue.qsize() + sum(len(jobs) for jobs in self.parked.values())
+
+    def _finish(self, job: dict, error: Exception = None, result=None):
+        if error is not None:
+            job["error"] = getattr(error, "detail", None) or str(error)
+            job["status"] = "failed"
+        else:
+            job["result"] = result if result is None else str(result)
+            job["status"] = "succeeded"
+        job["finished_at"] = time.time()
+        job["duration"] = job["finished_at"] - (job["started_at"] or job["finished_at"])
+
+    async def _run(self, job: dict, task_info: dict):
+        job["status"] = "running"
+        job["started_at"] = time.time()
+        try:
+            result = await self.execute(task_info)
+        except Exception as e:
+            self._finish(job, error=e)
+        else:
+            self._finish(job, result=result)
+
+    async def _worker(self):
+        while True:
+            job = await self.queue.get()
+            try:
+                try:
+                    task_info = await self.parse(job["task"])
+                    task_type = task_info["task_type"]
+                    job["task_type"] = task_type
+                except Exception as e:
+                    self._finish(job, error=e)
+                    continue
+
+                # Park the job instead of waiting here, so saturated types don't tie up workers
+                if self.running[task_type] >= self.type_limits.get(task_type, self.workers):
+                    self.parked.setdefault(task_type, deque()).append((job, task_info))
+                    continue
+
+                # The slot passes straight to the next parked job of the same type
+                self.running[task_type] += 1
+                try:
+                    while True:
+                        await self._run(job, task_info)
+                        if not self.parked.get(task_type):
+                            break
+                        job, task_info = self.parked[task_type].popleft()
+                finally:
+                    self.running[task_type] -= 1
+            finally:
+                self.queue.task_done()
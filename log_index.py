@@ -0,0 +1,124 @@
+import heapq
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from config import *
+
+def _is_log(entry) -> bool:
+    return entry.name.endswith(".log") and entry.is_file()
+
+def recent_logs(directory: str, num_files: int):
+    """Return [(path, mtime)] of the num_files most recently modified .log files, newest first.
+
+    Uses the stat data from os.scandir and a heap instead of sorting every file.
+    """
+    with os.scandir(directory) as entries:
+        logs = ((entry.path, entry.stat().st_mtime) for entry in entries if _is_log(entry))
+        return heapq.nlargest(num_files, logs, key=lambda log: log[1])
+
+def read_first_line(path: str) -> str:
+    with open(path, 'r') as f:
+        return f.readline().strip()
+
+def read_first_lines(paths: list, workers: int = LOG_READ_CONCURRENCY) -> list:
+    """Read the first line of each file concurrently, in the order given."""
+    if not paths:
+        return []
+    with ThreadPoolExecutor(max_workers=min(workers, len(paths))) as executor:
+        return list(executor.map(read_first_line, paths))
+
+class LogIndex:
+    """Persistent index of .log file mtimes per directory.
+
+    A directory is only listed again when its own mtime changes, i.e. when
+    files were added, removed or renamed, and then only new files are
+    stat-ed. Files are assumed not to be modified after they are created, as
+    with rotated logs; use recent_logs for directories where they are.
+    """
+
+    def __init__(self, cache_dir: str):
+        self.lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(cache_dir, "log_index.sqlite3"), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS log_dirs (
+                directory TEXT PRIMARY KEY,
+                mtime_ns INTEGER NOT NULL,
+                inode INTEGER NOT NULL
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS log_files (
+                directory TEXT NOT NULL,
+                name TEXT NOT NULL,
+                mtime REAL NOT NULL,
+                PRIMARY KEY (directory, name)
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS log_files_mtime ON log_files (directory, mtime)")
+        self.conn.commit()
+
+    def refresh(self, directory: str) -> bool:
+        """Bring the index for a directory up to date. Returns True if it was rescanned."""
+        directory = os.path.realpath(directory)
+        stat = os.stat(directory)
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT mtime_ns, inode FROM log_dirs WHERE directory = ?", (directory,)
+            ).fetchone()
+            if row == (stat.st_mtime_ns, stat.st_ino):
+                return False
+
+            # A different inode means the directory was replaced, start over
+            if row is not None and row[1] != stat.st_ino:
+                self.conn.execute("DELETE FROM log_files WHERE directory = ?", (directory,))
+            known = {name for (name,) in self.conn.execute(
+                "SELECT name FROM log_files WHERE directory = ?", (directory,)
+            )}
+
+            added = []
+            present = set()
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if not _is_log(entry):
+                        continue
+                    present.add(entry.name)
+                    if entry.name not in known:
+                        added.append((directory, entry.name, entry.stat().st_mtime))
+
+            removed = known - present
+            self.conn.executemany(
+                "DELETE FROM log_files WHERE directory = ? AND name = ?",
+                [(directory, name) for name in removed]
+            )
+            self.conn.executemany("INSERT INTO log_files (directory, name, mtime) VALUES (?, ?, ?)", added)
+            self.conn.execute(
+                "INSERT OR REPLACE INTO log_dirs (directory, mtime_ns, inode) VALUES (?, ?, ?)",
+                (directory, stat.st_mtime_ns, stat.st_ino)
+            )
+            self.conn.commit()
+            print(f"Log index for {directory}: {len(added)} added, {len(removed)} removed")  # Debug log
+            return True
+
+    def recent(self, directory: str, num_files: int):
+        """Return [(path, mtime)] of the num_files most recently modified .log files, newest first."""
+        self.refresh(directory)
+        directory = os.path.realpath(directory)
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT name, mtime FROM log_files WHERE directory = ? ORDER BY mtime DESC, name LIMIT ?",
+                (directory, num_files)
+            ).fetchall()
+        return [(os.path.join(directory, name), mtime) for name, mtime in rows]
+
+_log_index = None
+_log_index_lock = threading.Lock()
+
+def get_log_index() -> LogIndex:
+    """Return the shared log index under CACHE_DIR."""
+    global _log_index
+    with _log_index_lock:
+        if _log_index is None:
+            _log_index = LogIndex(CACHE_DIR)
+        return _log_index
@@ -0,0 +1,160 @@
+import importlib.util
+import re
+from functools import lru_cache
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+from config import *
+
+TEMPLATE_CHARS = "0123456789 "
+
+@lru_cache(maxsize=None)
+def _templates():
+    """Render each template character in PIL's default font as an ink map (0-1)."""
+    font = ImageFont.load_default()
+    ascent, descent = font.getmetrics() if hasattr(font, "getmetrics") else (font.getbbox("0")[3], 0)
+    height = ascent + descent
+    templates = {}
+    for char in TEMPLATE_CHARS:
+        width = max(int(round(font.getlength(char))), 1)
+        canvas = Image.new('L', (width, height), 0)
+        ImageDraw.Draw(canvas).text((0, 0), char, font=font, fill=255)
+        templates[char] = np.asarray(canvas, dtype=np.float32) / 255
+    return templates
+
+def _ink(image: Image.Image) -> np.ndarray:
+    """Map an image to ink intensity (0 = background, 1 = text), assuming a flat background."""
+    gray = np.asarray(image.convert('L'), dtype=np.float32)
+    background = np.median(np.concatenate([gray[0], gray[-1], gray[:, 0], gray[:, -1]]))
+    contrast = np.abs(gray - background)
+    peak = contrast.max()
+    return contrast / peak if peak else contrast
+
+def _bands(ink: np.ndarray, threshold: float = 0.5):
+    """Yield (top, bottom) row ranges of text lines."""
+    rows = (ink > threshold).any(axis=1)
+    top = None
+    for y, has_ink in enumerate(rows):
+        if has_ink and top is None:
+            top = y
+        elif not has_ink and top is not None:
+            yield top, y
+            top = None
+    if top is not None:
+        yield top, len(rows)
+
+def _decode(ink: np.ndarray, x: int, y: int, right: int, templates: dict, max_error: float = 1.0):
+    """Greedily match templates left to right from (x, y). Returns (text, worst match error).
+
+    Stops early once a glyph's error exceeds max_error.
+    """
+    text = []
+    worst = 0.0
+    height = next(iter(templates.values())).shape[0]
+    patch_rows = ink[max(y, 0):y + height]
+    if y < 0 or patch_rows.shape[0] < height:
+        return "", 1.0
+    while x < right:
+        best = None
+        for char, template in templates.items():
+            width = template.shape[1]
+            patch = patch_rows[:, x:x + width]
+            if patch.shape[1] < width:
+                patch = np.pad(patch, ((0, 0), (0, width - patch.shape[1])))
+            error = float(np.abs(patch - template).mean())
+            # Prefer the wider glyph on ties, a blank space also fits a digit's left edge
+            if best is None or (error, -width) < (best[0], -best[1]):
+                best = (error, width, char)
+        error, width, char = best
+        text.append(char)
+        worst = max(worst, error)
+        if worst > max_error:
+            break
+        x += width
+    return "".join(text), worst
+
+def template_lines(image: Image.Image, max_error: float = 1 - OCR_MIN_CONFIDENCE):
+    """Read lines of digits drawn in PIL's default font. Returns [(text, confidence)].
+
+    Each line is decoded from every possible starting glyph and the best
+    decoding kept; confidence is one minus the worst per-glyph error. Lines
+    are abandoned as soon as a glyph matches worse than max_error.
+    """
+    templates = _templates()
+    ink = _ink(image)
+    # Ink offsets of each glyph inside its template, to line templates up with a band
+    offsets = {}
+    for char, template in templates.items():
+        rows, cols = np.nonzero(template > 0.5)
+        if len(rows):
+            offsets[char] = (int(rows.min()), int(cols.min()))
+
+    lines = []
+    for top, bottom in _bands(ink):
+        cols = np.nonzero((ink[top:bottom] > 0.5).any(axis=0))[0]
+        left, right = int(cols.min()), int(cols.max()) + 1
+        best = None
+        for char, (row_offset, col_offset) in offsets.items():
+            text, error = _decode(ink, left - col_offset, top - row_offset, right, templates, max_error)
+            if text and (best is None or error < best[1]):
+                best = (text, error)
+        if best:
+            lines.append((best[0].strip(), 1.0 - best[1]))
+    return lines
+
+def tesseract_lines(image: Image.Image):
+    """Read lines with Tesseract via pytesseract. Returns [(text, confidence)]."""
+    import pytesseract
+    data = pytesseract.image_to_data(image, output_type=pytesseract.Output.DICT)
+    lines = {}
+    for i, word in enumerate(data["text"]):
+        if not word.strip() or float(data["conf"][i]) < 0:
+            continue
+        key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+        words, confidences = lines.setdefault(key, ([], []))
+        words.append(word)
+        confidences.append(float(data["conf"][i]) / 100)
+    return [(" ".join(words), min(confidences)) for words, confidences in lines.values()]
+
+# name -> function(image) returning [(text, confidence)] per line of text
+OCR_BACKENDS = {"template": template_lines}
+if importlib.util.find_spec("pytesseract") is not None:
+    OCR_BACKENDS["tesseract"] = tesseract_lines
+
+def register_ocr_backend(name: str, backend):
+    """Make an OCR backend available to A8 under OCR_BACKEND=name."""
+    OCR_BACKENDS[name] = backend
+
+def check_ocr_backend(backend: str = OCR_BACKEND) -> bool:
+    """Warn once at startup when the configured OCR backend isn't available."""
+    if backend == "none" or backend in OCR_BACKENDS:
+        return True
+    print(f"OCR backend {backend!r} is not available ({', '.join(OCR_BACKENDS)}), A8 will use the LLM")  # Debug log
+    return False
+
+def luhn_valid(number: str) -> bool:
+    """Check a card number's Luhn checksum."""
+    total = 0
+    for i, digit in enumerate(reversed(number)):
+        value = int(digit) * (2 if i % 2 else 1)
+        total += value - 9 if value > 9 else value
+    return total % 10 == 0
+
+def read_card_number(image_path: str, backend: str = OCR_BACKEND):
+    """Find a Luhn-valid 13-19 digit number in an image with a local OCR backend.
+
+    Returns (number, confidence), or (None, 0.0) when no line qualifies.
+    """
+    if backend not in OCR_BACKENDS:
+        raise ValueError(f"Unknown OCR backend: {backend}")
+    with Image.open(image_path) as image:
+        lines = OCR_BACKENDS[backend](image)
+
+    candidates = []
+    for text, confidence in lines:
+        number = re.sub(r"[\s-]", "", text)
+        if re.fullmatch(r"\d{13,19}", number) and luhn_valid(number):
+            candidates.append((confidence, number))
+    if not candidates:
+        return None, 0.0
+    confidence, number = max(candidates)
+    return number, confidence
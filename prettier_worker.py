@@ -0,0 +1,201 @@
+import json
+import queue
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+from config import *
+
+# Node side of the worker: one JSON request per line on stdin, one JSON
+# response per line on stdout
+WORKER_SCRIPT = r"""
+const readline = require("readline");
+const prettier = require(process.argv[2]);
+
+const rl = readline.createInterface({ input: process.stdin, terminal: false });
+rl.on("line", async (line) => {
+  let request = {};
+  try {
+    request = JSON.parse(line);
+    // Like the CLI, let .editorconfig fill in options the prettier config doesn't set
+    const options = (await prettier.resolveConfig(request.filepath, { editorconfig: true })) || {};
+    const formatted = await prettier.format(request.content, { ...options, filepath: request.filepath });
+    process.stdout.write(JSON.stringify({ id: request.id, formatted }) + "\n");
+  } catch (e) {
+    process.stdout.write(JSON.stringify({ id: request.id, error: String((e && e.message) || e) }) + "\n");
+  }
+});
+"""
+
+# Exact versions only: the string names a directory under CACHE_DIR and goes to npm
+PRETTIER_VERSION_RE = re.compile(r"prettier@\d+\.\d+\.\d+(?:-[0-9A-Za-z-]+(?:\.[0-9A-Za-z-]+)*)?")
+
+def check_prettier_version(prettier_version: str) -> str:
+    """Return prettier_version if it is prettier@<semver>, else raise ValueError."""
+    if not isinstance(prettier_version, str) or not PRETTIER_VERSION_RE.fullmatch(prettier_version):
+        raise ValueError(f"Unsupported prettier version: {prettier_version!r}, expected prettier@<major>.<minor>.<patch>")
+    return prettier_version
+
+_install_lock = threading.Lock()
+
+def install_prettier(prettier_version: str = "prettier@3.4.2") -> str:
+    """Install a prettier version once under CACHE_DIR and return its install directory."""
+    name = check_prettier_version(prettier_version)
+    install_dir = os.path.join(CACHE_DIR, "prettier", name)
+    package_json = os.path.join(install_dir, "node_modules", "prettier", "package.json")
+
+    with _install_lock:
+        if os.path.exists(package_json):
+            return install_dir
+
+        # Install into a scratch directory and move it into place when complete
+        os.makedirs(os.path.dirname(install_dir), exist_ok=True)
+        temp_dir = tempfile.mkdtemp(prefix=f"{name}.", dir=os.path.dirname(install_dir))
+        try:
+            result = subprocess.run(
+                ["npm", "install", "--prefix", temp_dir, "--no-save", "--no-audit", "--no-fund", prettier_version],
+                capture_output=True, text=True
+            )
+            if result.returncode != 0:
+                raise Exception(f"Error installing prettier: {result.stderr}")
+            with open(os.path.join(temp_dir, "worker.js"), "w") as f:
+                f.write(WORKER_SCRIPT)
+            shutil.rmtree(install_dir, ignore_errors=True)
+            os.replace(temp_dir, install_dir)
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    return install_dir
+
+class PrettierWorker:
+    """A long-lived Node process that formats files with one prettier install."""
+
+    def __init__(self, install_dir: str, timeout: float = PRETTIER_TIMEOUT):
+        self.install_dir = install_dir
+        self.timeout = timeout
+        self.process = None
+        self.lines = None
+        self.next_id = 0
+
+    def _start(self):
+        module_path = os.path.join(self.install_dir, "node_modules", "prettier")
+        self.process = subprocess.Popen(
+            ["node", os.path.join(self.install_dir, "worker.js"), module_path],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            text=True, encoding="utf-8", bufsize=1
+        )
+        # A reader thread per process lets format() wait for an answer with a deadline
+        self.lines = queue.Queue()
+        threading.Thread(target=self._read, args=(self.process.stdout, self.lines), daemon=True).start()
+
+    @staticmethod
+    def _read(stdout, lines: queue.Queue):
+        for line in stdout:
+            lines.put(line)
+        lines.put("")
+
+    def format(self, content: str, filepath: str) -> str:
+        """Format content as prettier would for a file at filepath."""
+        if self.process is None or self.process.poll() is not None:
+            self._start()
+
+        self.next_id += 1
+        request = {"id": self.next_id, "content": content, "filepath": filepath}
+        try:
+            self.process.stdin.write(json.dumps(request) + "\n")
+            self.process.stdin.flush()
+            line = self.lines.get(timeout=self.timeout or None)
+        except queue.Empty:
+            # Hung on this input: replace the process so the next request gets a live one
+            self.close()
+            self._start()
+            raise Exception(f"Prettier worker did not answer within {self.timeout} seconds, restarted it")
+        except (BrokenPipeError, OSError) as e:
+            self.close()
+            raise Exception(f"Prettier worker failed: {str(e)}")
+
+        if not line:
+            self.close()
+            raise Exception("Prettier worker exited unexpectedly")
+
+        response = json.loads(line)
+        if "error" in response:
+            raise Exception(f"Error formatting file: {response['error']}")
+        return response["formatted"]
+
+    def close(self):
+        """Stop the Node process."""
+        if self.process is not None:
+            if self.process.poll() is None:
+                self.process.kill()
+            self.process.wait()
+            self.process = None
+            self.lines = None
+
+class PrettierPool:
+    """Up to `size` workers for one prettier version, each serving one request at a time."""
+
+    def __init__(self, prettier_version: str, size: int = 1):
+        self.prettier_version = check_prettier_version(prettier_version)
+        self.size = size
+        self.idle = queue.Queue()
+        self.started = 0
+        self.lock = threading.Lock()
+
+    def _acquire(self) -> PrettierWorker:
+        with self.lock:
+            start_new = self.idle.empty() and self.started < self.size
+            if start_new:
+                self.started += 1
+        if not start_new:
+            return self.idle.get()
+
+        try:
+            return PrettierWorker(install_prettier(self.prettier_version))
+        except Exception:
+            with self.lock:
+                self.started -= 1
+            raise
+
+    def format(self, content: str, filepath: str) -> str:
+        """Format content on the next free worker."""
+        worker = self._acquire()
+        try:
+            return worker.format(content, filepath)
+        finally:
+            self.idle.put(worker)
+
+    def warm_up(self):
+        """Install prettier and start a worker so the first request is fast."""
+        self.format("", "warmup.md")
+
+    def close(self):
+        """Stop all idle workers."""
+        while not self.idle.empty():
+            self.idle.get().close()
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_prettier_pool(prettier_version: str = "prettier@3.4.2") -> PrettierPool:
+    """Return the shared worker pool for a prettier version."""
+    check_prettier_version(prettier_version)
+    with _pools_lock:
+        if prettier_version not in _pools:
+            _pools[prettier_version] = PrettierPool(prettier_version, PRETTIER_WORKERS)
+        return _pools[prettier_version]
+
+def warm_up_prettier(prettier_version: str):
+    """Install and start prettier ahead of the first A2 call, logging failures."""
+    try:
+        get_prettier_pool(prettier_version).warm_up()
+        print(f"Prettier worker ready: {prettier_version}")  # Debug log
+    except Exception as e:
+        print(f"Prettier warm-up failed: {str(e)}")  # Debug log
+
+def close_prettier_pools():
+    """Stop the workers of every pool."""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
@@ -0,0 +1,190 @@
+import hashlib
+import json
+import re
+import shutil
+import sqlite3
+import threading
+import time
+from collections import Counter
+from config import *
+
+# String literals and quoted identifiers, whose whitespace is significant
+QUOTED_RE = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"")
+
+# Queries whose result can change without the database changing
+VOLATILE_RE = re.compile(
+    r"\b(random|randomblob|now|current_date|current_time|current_timestamp|uuid|gen_random_uuid|read_\w+)\b|'now'",
+    re.IGNORECASE
+)
+
+def normalize_query(query: str) -> str:
+    """Collapse whitespace outside quotes and drop trailing semicolons."""
+    parts = []
+    position = 0
+    for match in QUOTED_RE.finditer(query):
+        parts.append(" ".join(query[position:match.start()].split()))
+        parts.append(match.group())
+        position = match.end()
+    parts.append(" ".join(query[position:].split()))
+    return " ".join(part for part in parts if part).rstrip("; ")
+
+def database_version(real_db: str):
+    """Identify the state of a database file by inode, size and mtime, including its write-ahead log.
+
+    SQLite's PRAGMA data_version is only comparable on a single connection, so
+    it can't key a cache that outlives one; committed WAL transactions don't
+    touch the main file, so the -wal (or DuckDB .wal) file is part of the version.
+    """
+    version = []
+    for path in (real_db, real_db + "-wal", real_db + ".wal"):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        version.append((os.path.basename(path), stat.st_ino, stat.st_size, stat.st_mtime_ns))
+    return version
+
+def place_file(source: str, path: str, link: bool = False) -> None:
+    """Atomically put a copy (or hard link) of source at path."""
+    directory = os.path.dirname(path) or "."
+    temp_path = os.path.join(directory, f".{os.path.basename(path)}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        if link:
+            try:
+                os.link(source, temp_path)
+            except OSError:
+                # Different filesystem, or links not supported
+                link = False
+        if not link:
+            shutil.copyfile(source, temp_path)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+class QueryResultCache:
+    """On-disk LRU of B5 output files, keyed by query, database version and output format."""
+
+    def __init__(self, cache_dir: str, max_bytes: int = 1024 ** 3, max_entries: int = 1000, link: bool = False):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.link = link
+        self.stats = Counter()
+        self.lock = threading.Lock()
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(cache_dir, "index.sqlite3"), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS query_results (
+                key TEXT PRIMARY KEY,
+                file TEXT NOT NULL,
+                rows INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS query_results_accessed_at ON query_results (accessed_at)")
+        self.conn.commit()
+
+    @staticmethod
+    def make_key(real_db: str, query: str, output_format: str):
+        """Hash the normalized query with the database's path and version, or None if it can't be cached."""
+        query = normalize_query(query)
+        if VOLATILE_RE.search(query):
+            return None
+        real_db = os.path.realpath(real_db)
+        payload = json.dumps([query, real_db, database_version(real_db), output_format])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _drop(self, key: str, file: str):
+        self.conn.execute("DELETE FROM query_results WHERE key = ?", (key,))
+        path = os.path.join(self.cache_dir, file)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def fetch(self, key: str, path: str, max_rows: int = 0):
+        """Place the cached output for a key at path. Returns its row count, or None on a miss.
+
+        A result over max_rows is only counted, not placed.
+        """
+        with self.lock:
+            row = self.conn.execute("SELECT file, rows FROM query_results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            file, rows = row
+            if max_rows and rows > max_rows:
+                self.stats["hits"] += 1
+                return rows
+            try:
+                place_file(os.path.join(self.cache_dir, file), path, self.link)
+            except FileNotFoundError:
+                # The file went away behind our back
+                self._drop(key, file)
+                self.conn.commit()
+                self.stats["misses"] += 1
+                return None
+            self.conn.execute("UPDATE query_results SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self.conn.commit()
+            self.stats["hits"] += 1
+            return rows
+
+    def store(self, key: str, path: str, rows: int):
+        """Keep a copy of an output file, evicting the least recently used results over the limits."""
+        size = os.path.getsize(path)
+        if size > self.max_bytes:
+            self.stats["too_large"] += 1
+            return
+        file = key + os.path.splitext(path)[1]
+        with self.lock:
+            place_file(path, os.path.join(self.cache_dir, file), self.link)
+            self.conn.execute(
+                "INSERT OR REPLACE INTO query_results (key, file, rows, size, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, file, rows, size, time.time())
+            )
+
+            count, total = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM query_results").fetchone()
+            if count > self.max_entries or total > self.max_bytes:
+                for old_key, old_file, old_size in self.conn.execute(
+                    "SELECT key, file, size FROM query_results ORDER BY accessed_at"
+                ).fetchall():
+                    if count <= self.max_entries and total <= self.max_bytes:
+                        break
+                    if old_key == key:
+                        continue
+                    self._drop(old_key, old_file)
+                    count -= 1
+                    total -= old_size
+                    self.stats["evictions"] += 1
+            self.conn.commit()
+            self.stats["stores"] += 1
+
+    def get_stats(self) -> dict:
+        """Return hit/miss counters and current sizes."""
+        with self.lock:
+            count, total = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM query_results").fetchone()
+            return {**self.stats, "entries": count, "bytes": total}
+
+_query_cache = None
+_query_cache_lock = threading.Lock()
+
+def get_query_cache():
+    """Return the shared B5 result cache under CACHE_DIR, or None when disabled.
+
+    Only read-only connections are cached, a writable one may run statements
+    that change the database.
+    """
+    global _query_cache
+    if not B5_CACHE_ENABLED or not DB_READ_ONLY:
+        return None
+    with _query_cache_lock:
+        if _query_cache is None:
+            _query_cache = QueryResultCache(
+                os.path.join(CACHE_DIR, "query_results"),
+                max_bytes=B5_CACHE_MAX_BYTES,
+                max_entries=B5_CACHE_MAX_ENTRIES,
+                link=B5_CACHE_LINK
+            )
+        return _query_cache
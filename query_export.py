@@ -0,0 +1,179 @@
+import csv
+import json
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+import duckdb
+import pandas as pd
+from config import *
+from db_pool import db_pool
+from external_sort import write_json_array
+from streaming import iter_chunks
+
+EXPORT_FORMATS = ("json", "ndjson", "csv", "parquet")
+
+FORMAT_EXTENSIONS = {
+    ".json": "json",
+    ".ndjson": "ndjson",
+    ".jsonl": "ndjson",
+    ".csv": "csv",
+    ".parquet": "parquet",
+}
+
+def export_format(output_path: str, output_format: str = None) -> str:
+    """Return the output format, taken from the output file's extension unless given."""
+    if output_format:
+        output_format = output_format.lower()
+        if output_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported output format: {output_format}")
+        return output_format
+    return FORMAT_EXTENSIONS.get(os.path.splitext(output_path)[1].lower(), "json")
+
+def is_sqlite(db_path: str) -> bool:
+    """SQLite for .db files, DuckDB otherwise."""
+    return db_path.endswith('.db')
+
+@contextmanager
+def temporary_output(path: str):
+    """Yield a temporary path next to path, moved into place only if the block succeeds.
+
+    The path sits in its own scratch directory so side files (DuckDB writes
+    COPY output via "<path>.tmp") are cleaned up on failure too.
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    temp_dir = tempfile.mkdtemp(prefix=f".{os.path.basename(path)}.", dir=directory)
+    try:
+        temp_path = os.path.join(temp_dir, os.path.basename(path))
+        yield temp_path
+        os.replace(temp_path, path)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+@contextmanager
+def open_query(real_db: str, query: str, timeout: float):
+    """Execute a query on a pooled connection and yield (columns, cursor), interrupting it after timeout seconds."""
+    if is_sqlite(real_db):
+        with db_pool.sqlite(real_db) as conn:
+            if timeout:
+                deadline = time.monotonic() + timeout
+                conn.set_progress_handler(lambda: time.monotonic() > deadline, 10000)
+            cursor = conn.execute(query)
+            try:
+                yield [desc[0] for desc in cursor.description or []], cursor
+            finally:
+                cursor.close()
+                conn.set_progress_handler(None, 0)
+    else:
+        with db_pool.duckdb(real_db) as cursor:
+            timer = threading.Timer(timeout, cursor.interrupt) if timeout else None
+            if timer:
+                timer.start()
+            try:
+                cursor.execute(query)
+                yield [desc[0] for desc in cursor.description or []], cursor
+            finally:
+                if timer:
+                    timer.cancel()
+
+def iter_rows(cursor, fetch_size: int = B5_FETCH_SIZE, max_rows: int = 0):
+    """Yield result rows fetched in batches, failing once more than max_rows arrive."""
+    count = 0
+    while True:
+        batch = cursor.fetchmany(fetch_size)
+        if not batch:
+            return
+        count += len(batch)
+        if max_rows and count > max_rows:
+            raise Exception(f"Query returned more than {max_rows} rows")
+        yield from batch
+
+def write_rows(columns: list, rows, path: str, output_format: str) -> None:
+    """Stream rows to a file in the given format."""
+    if output_format == "parquet":
+        # Stage batches in a scratch DuckDB database, which spills to disk, then COPY out
+        staging = duckdb.connect()
+        try:
+            created = False
+            for batch in iter_chunks(rows, B5_FETCH_SIZE):
+                staging.register("batch", pd.DataFrame(batch, columns=columns))
+                staging.execute("INSERT INTO results SELECT * FROM batch" if created else "CREATE TABLE results AS SELECT * FROM batch")
+                staging.unregister("batch")
+                created = True
+            if not created:
+                staging.register("batch", pd.DataFrame([], columns=columns))
+                staging.execute("CREATE TABLE results AS SELECT * FROM batch")
+            staging.execute(f"COPY results TO '{_quote(path)}' (FORMAT PARQUET)")
+        finally:
+            staging.close()
+        return
+
+    with open(path, 'w', newline='' if output_format == "csv" else None) as f:
+        if output_format == "json":
+            write_json_array((dict(zip(columns, row)) for row in rows), f, default=str)
+        elif output_format == "ndjson":
+            for row in rows:
+                f.write(json.dumps(dict(zip(columns, row)), default=str, separators=(",", ":")))
+                f.write("\n")
+        elif output_format == "csv":
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            writer.writerows(rows)
+
+def _quote(value: str) -> str:
+    return value.replace("'", "''")
+
+def copy_duckdb(real_db: str, query: str, path: str, output_format: str, max_rows: int, timeout: float) -> int:
+    """Write a DuckDB query straight to a file with COPY ... TO. Returns the row count."""
+    options = {"csv": "FORMAT CSV, HEADER", "ndjson": "FORMAT JSON", "parquet": "FORMAT PARQUET"}[output_format]
+    query = query.strip().rstrip(";")
+    if max_rows:
+        # One row over the limit is enough to tell the query is too large
+        query = f"SELECT * FROM ({query}) LIMIT {max_rows + 1}"
+    with open_query(real_db, f"COPY ({query}) TO '{_quote(path)}' ({options})", timeout) as (_, cursor):
+        count = cursor.fetchone()[0]
+    if max_rows and count > max_rows:
+        raise Exception(f"Query returned more than {max_rows} rows")
+    return count
+
+def export_query(real_db: str, query: str, real_output: str, output_format: str = None,
+                 max_rows: int = B5_MAX_ROWS, timeout: float = B5_TIMEOUT, cache=None) -> int:
+    """Run a query and stream its results to real_output. Returns the number of rows written.
+
+    Results never exist in memory all at once. Output appears atomically and
+    only when the query finishes within max_rows and timeout (0 disables them).
+    With a QueryResultCache, an identical query on an unchanged database is
+    answered from the output file saved the last time.
+    """
+    output_format = export_format(real_output, output_format)
+    key = cache.make_key(real_db, query, output_format) if cache is not None else None
+    if key is not None:
+        rows = cache.fetch(key, real_output, max_rows)
+        if rows is not None:
+            print(f"B5 result cache hit: {rows} rows")  # Debug log
+            if max_rows and rows > max_rows:
+                raise Exception(f"Query returned more than {max_rows} rows")
+            return rows
+
+    rows = _export_query(real_db, query, real_output, output_format, max_rows, timeout)
+    # Skip results of a database that changed while the query ran
+    if key is not None and cache.make_key(real_db, query, output_format) == key:
+        cache.store(key, real_output, rows)
+    return rows
+
+def _export_query(real_db: str, query: str, real_output: str, output_format: str, max_rows: int, timeout: float) -> int:
+    with temporary_output(real_output) as temp_path:
+        if not is_sqlite(real_db) and output_format != "json":
+            return copy_duckdb(real_db, query, temp_path, output_format, max_rows, timeout)
+
+        counted = 0
+        with open_query(real_db, query, timeout) as (columns, cursor):
+            def counting(rows):
+                nonlocal counted
+                for row in rows:
+                    counted += 1
+                    yield row
+            write_rows(columns, counting(iter_rows(cursor, max_rows=max_rows)), temp_path, output_format)
+        return counted
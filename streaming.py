@@ -0,0 +1,87 @@
+import codecs
+import mmap
+from itertools import islice
+from config import *
+
+# Byte order marks and the encodings they imply, longest first
+BOMS = [
+    (codecs.BOM_UTF32_LE, "utf-32-le"),
+    (codecs.BOM_UTF32_BE, "utf-32-be"),
+    (codecs.BOM_UTF8, "utf-8"),
+    (codecs.BOM_UTF16_LE, "utf-16-le"),
+    (codecs.BOM_UTF16_BE, "utf-16-be"),
+]
+
+def detect_bom(path: str):
+    """Return (encoding, bom_length) if the file starts with a byte order mark, else (None, 0)."""
+    with open(path, 'rb') as f:
+        head = f.read(4)
+    for bom, encoding in BOMS:
+        if head.startswith(bom):
+            return encoding, len(bom)
+    return None, 0
+
+def _iter_raw_lines(f, chunk_size: int):
+    # Buffered chunked reads, carrying the partial last line into the next chunk
+    pending = b""
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            break
+        lines = (pending + chunk).split(b"\n")
+        pending = lines.pop()
+        yield from lines
+    if pending:
+        yield pending
+
+def _iter_mmap_lines(mm, start: int):
+    position = start
+    size = len(mm)
+    while position < size:
+        end = mm.find(b"\n", position)
+        if end == -1:
+            end = size
+        yield mm[position:end]
+        position = end + 1
+
+def iter_lines(path: str, encoding: str = "utf-8", chunk_size: int = STREAM_CHUNK_SIZE, use_mmap: bool = None):
+    """Yield the lines of a file without line endings, reading it incrementally.
+
+    Memory use is bounded by chunk_size and the longest line, not the file
+    size. A byte order mark overrides the encoding. Large files are memory
+    mapped unless use_mmap is False.
+    """
+    bom_encoding, bom_length = detect_bom(path)
+    encoding = bom_encoding or encoding
+
+    # Multi-byte encodings can't be split on the newline byte, decode as a stream
+    if codecs.lookup(encoding).name.startswith(("utf-16", "utf-32")):
+        with open(path, 'r', encoding=encoding) as f:
+            if bom_length:
+                f.read(1)
+            for line in f:
+                yield line.rstrip("\r\n")
+        return
+
+    size = os.path.getsize(path)
+    if use_mmap is None:
+        use_mmap = size >= STREAM_MMAP_THRESHOLD
+
+    with open(path, 'rb') as f:
+        if use_mmap and size > bom_length:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                for raw in _iter_mmap_lines(mm, bom_length):
+                    yield raw.rstrip(b"\r").decode(encoding)
+        else:
+            f.seek(bom_length)
+            for raw in _iter_raw_lines(f, chunk_size):
+                yield raw.rstrip(b"\r").decode(encoding)
+
+def iter_chunks(iterable, size: int):
+    """Yield lists of up to size items from an iterable."""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
@@ -0,0 +1,110 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+from config import *
+
+def normalize_description(description: str) -> str:
+    """Collapse whitespace so trivially different phrasings share a cache entry."""
+    return " ".join(description.split())
+
+class TaskInfoCache:
+    """In-memory LRU in front of an SQLite store of parsed task descriptions."""
+
+    def __init__(self, cache_dir: str, max_memory_entries: int = 1024, max_disk_entries: int = 100000, ttl: float = 0):
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl = ttl
+        self.memory = OrderedDict()  # key -> (created_at, task_info JSON)
+        self.stats = Counter()
+        self.lock = threading.Lock()
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(cache_dir, "task_info.sqlite3"), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS task_info (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS task_info_accessed_at ON task_info (accessed_at)")
+        self.conn.commit()
+
+    @staticmethod
+    def make_key(description: str, prompt_version: str) -> str:
+        """Hash the normalized description together with the parser prompt version."""
+        payload = f"{prompt_version}\0{normalize_description(description)}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.ttl > 0 and now - created_at > self.ttl
+
+    def _remember(self, key: str, created_at: float, value: str):
+        self.memory[key] = (created_at, value)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_memory_entries:
+            self.memory.popitem(last=False)
+
+    def get(self, key: str):
+        """Return the cached task info for a key, or None on a miss."""
+        now = time.time()
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                if not self._expired(entry[0], now):
+                    self.memory.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    return json.loads(entry[1])
+                del self.memory[key]
+
+            row = self.conn.execute("SELECT value, created_at FROM task_info WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+
+            value, created_at = row
+            if self._expired(created_at, now):
+                self.conn.execute("DELETE FROM task_info WHERE key = ?", (key,))
+                self.conn.commit()
+                self.stats["expired"] += 1
+                self.stats["misses"] += 1
+                return None
+
+            self.conn.execute("UPDATE task_info SET accessed_at = ? WHERE key = ?", (now, key))
+            self.conn.commit()
+            self._remember(key, created_at, value)
+            self.stats["disk_hits"] += 1
+            return json.loads(value)
+
+    def put(self, key: str, task_info: dict):
+        """Store parsed task info, evicting the least recently used entries."""
+        now = time.time()
+        value = json.dumps(task_info)
+        with self.lock:
+            self._remember(key, now, value)
+            self.conn.execute(
+                "INSERT OR REPLACE INTO task_info (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now, now)
+            )
+
+            # Evict least recently used rows beyond the size limit
+            count = self.conn.execute("SELECT COUNT(*) FROM task_info").fetchone()[0]
+            if count > self.max_disk_entries:
+                self.conn.execute(
+                    "DELETE FROM task_info WHERE key IN (SELECT key FROM task_info ORDER BY accessed_at LIMIT ?)",
+                    (count - self.max_disk_entries,)
+                )
+                self.stats["evictions"] += count - self.max_disk_entries
+            self.conn.commit()
+            self.stats["stores"] += 1
+
+    def get_stats(self) -> dict:
+        """Return hit/miss counters and current sizes."""
+        with self.lock:
+            disk_entries = self.conn.execute("SELECT COUNT(*) FROM task_info").fetchone()[0]
+            return {**self.stats, "memory_entries": len(self.memory), "disk_entries": disk_entries}
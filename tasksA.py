@@ -1,15 +1,23 @@
 import os
 import json
+import asyncio
 import httpx
-import base64
 from datetime import datetime
-import sqlite3
 import subprocess
-from dateutil import parser
 import numpy as np
-from scipy.spatial.distance import cdist
 from config import *
-from PIL import Image
+from http_client import use_client
+from prettier_worker import get_prettier_pool
+from dates import count_weekday, parse_weekday, WEEKDAYS
+from streaming import iter_lines, iter_chunks
+from log_index import get_log_index, read_first_lines, recent_logs
+from doc_index import build_index
+from email_headers import sender_address
+from image_payload import image_data_url
+from ocr import read_card_number
+from ticket_sales import sum_by_type
+from external_sort import external_sort, iter_json_array, loads, write_json_array
+from embeddings import fetch_embeddings, get_embedding_store, most_similar_pairs
 
 async def A1(email: str):
     """Install uv and run datagen.py with email as argument."""
@@ -32,79 +40,69 @@ async def A2(prettier_version: str = "prettier@3.4.2", filename: str = "/data/fo
         with open(real_path, 'r') as f:
             content = f.read()
             
-        # Create a temporary directory for node_modules
-        temp_dir = "/tmp/prettier_temp"
-        os.makedirs(temp_dir, exist_ok=True)
-        os.chdir(temp_dir)
-        
-        # Install prettier locally
-        install_result = subprocess.run(["npm", "install", prettier_version], capture_output=True, text=True)
-        if install_result.returncode != 0:
-            raise Exception(f"Error installing prettier: {install_result.stderr}")
-            
-        # Run prettier using node directly
-        prettier_path = os.path.join(temp_dir, "node_modules", ".bin", "prettier")
-        result = subprocess.run([prettier_path, "--stdin-filepath", real_path], 
-                               input=content, capture_output=True, text=True)
-        if result.returncode != 0:
-            raise Exception(f"Error formatting file: {result.stderr}")
+        # Format on a long-lived worker backed by a cached install of this version
+        formatted = get_prettier_pool(prettier_version).format(content, real_path)
             
         # Write the formatted content back to the file
         with open(real_path, 'w') as f:
-            f.write(result.stdout)
+            f.write(formatted)
             
-        # Clean up
-        subprocess.run(["rm", "-rf", temp_dir])
         return "File formatted successfully"
     except Exception as e:
-        # Clean up in case of error
-        subprocess.run(["rm", "-rf", temp_dir])
         raise Exception(f"Failed to format file: {str(e)}")
 
-async def A3(filename: str = '/data/dates.txt', targetfile: str = '/data/dates-wednesdays.txt'):
-    """Count Wednesdays in a list of dates."""
+async def A3(filename: str = '/data/dates.txt', targetfile: str = '/data/dates-wednesdays.txt', weekday: str = 'wednesday'):
+    """Count dates falling on a weekday (Wednesday by default) in a list of dates."""
     ensure_data_path(filename)
     ensure_data_path(targetfile)
     real_input = get_real_path(filename)
     real_output = get_real_path(targetfile)
     
     try:
-        # Read dates from file
-        with open(real_input, 'r') as f:
-            dates = f.readlines()
-        
-        # Count Wednesdays
-        wednesday_count = 0
-        for date_str in dates:
-            date_str = date_str.strip()
-            if not date_str:
-                continue
-            try:
-                date = parser.parse(date_str)
-                if date.weekday() == 2:  # Wednesday is 2 (0 is Monday)
-                    wednesday_count += 1
-            except:
-                continue
+        # Stream the file in batches of lines so memory doesn't grow with its size,
+        # parsing known formats in bulk and falling back to dateutil for the rest
+        count = unparsed = 0
+        for dates in iter_chunks(iter_lines(real_input), STREAM_BATCH_LINES):
+            batch_count, batch_unparsed = count_weekday(dates, weekday)
+            count += batch_count
+            unparsed += batch_unparsed
+        if unparsed:
+            print(f"Could not parse {unparsed} dates in {filename}")  # Debug log
         
         # Write result to output file
         with open(real_output, 'w') as f:
-            f.write(str(wednesday_count))
+            f.write(str(count))
             
-        return f"Found {wednesday_count} Wednesdays"
+        return f"Found {count} {WEEKDAYS[parse_weekday(weekday)].capitalize()}s ({unparsed} lines could not be parsed)"
     except Exception as e:
         raise Exception(f"Failed to process dates: {str(e)}")
 
 async def A4(filename: str = "/data/contacts.json", targetfile: str = "/data/contacts-sorted.json"):
-    """Sort contacts by last_name, then first_name."""
+    """Sort contacts by last_name, then first_name.
+
+    Files above A4_MEMORY_LIMIT are streamed and sorted externally in bounded
+    memory; the output is the same either way.
+    """
     ensure_data_path(filename)
     ensure_data_path(targetfile)
     real_input = get_real_path(filename)
     real_output = get_real_path(targetfile)
+    sort_key = lambda x: (x['last_name'], x['first_name'])
+    
+    mode = A4_SORT_MODE
+    if mode == "auto":
+        mode = "memory" if os.path.getsize(real_input) <= A4_MEMORY_LIMIT else "external"
     
-    with open(real_input, 'r') as f:
-        contacts = json.load(f)
+    if mode == "external":
+        contacts = external_sort(iter_json_array(real_input), sort_key, spill_dir=EXTERNAL_SORT_DIR)
+        with open(real_output, 'w') as f:
+            write_json_array(contacts, f)
+        return
+    
+    with open(real_input, 'rb') as f:
+        contacts = loads(f.read())
         
-    sorted_contacts = sorted(contacts, key=lambda x: (x['last_name'], x['first_name']))
+    sorted_contacts = sorted(contacts, key=sort_key)
     
     with open(real_output, 'w') as f:
         json.dump(sorted_contacts, f, indent=2)
@@ -116,26 +114,21 @@ async def A5(log_dir: str = '/data/logs', output_file: str = '/data/logs-recent.
     real_log_dir = get_real_path(log_dir)
     real_output = get_real_path(output_file)
     
-    # Get all .log files with their modification times
-    log_files = []
-    for file in Path(real_log_dir).glob("*.log"):
-        log_files.append((file, os.path.getmtime(file)))
-        
-    # Sort by modification time (newest first) and take top 10
-    recent_files = sorted(log_files, key=lambda x: x[1], reverse=True)[:num_files]
+    # Newest .log files first, from the persistent mtime index or a single scandir pass
+    if LOG_INDEX_ENABLED:
+        recent_files = get_log_index().recent(real_log_dir, int(num_files))
+    else:
+        recent_files = recent_logs(real_log_dir, int(num_files))
     
     # Extract first line from each file
-    first_lines = []
-    for file, _ in recent_files:
-        with open(file, 'r') as f:
-            first_lines.append(f.readline().strip())
+    first_lines = read_first_lines([file for file, _ in recent_files])
             
     # Write results
     with open(real_output, 'w') as f:
         f.write('\n'.join(first_lines))
 
 async def A6(doc_dir: str = '/data/docs', output_file: str = '/data/docs/index.json'):
-    """Create index of markdown file titles."""
+    """Create index of markdown file titles (the first H1 of each file)."""
     ensure_data_path(doc_dir)
     ensure_data_path(output_file)
     real_doc_dir = get_real_path(doc_dir)
@@ -144,88 +137,113 @@ async def A6(doc_dir: str = '/data/docs', output_file: str = '/data/docs/index.j
     # Create output directory if it doesn't exist
     os.makedirs(os.path.dirname(real_output), exist_ok=True)
     
-    # Process markdown files
-    index = {}
-    for root, _, files in sorted(os.walk(real_doc_dir)):
-        for file in sorted(files):
-            if file.endswith('.md'):
-                file_path = os.path.join(root, file)
-                relative_path = os.path.relpath(file_path, real_doc_dir)
-                
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    for line in f:
-                        line = line.strip()
-                        if line.startswith('# '):  # First H1 found
-                            index[relative_path] = line[2:].strip()
-                            break
+    # Titles sorted by path, only re-reading files changed since the last run
+    sorted_index = build_index(real_doc_dir, incremental=DOC_INDEX_ENABLED)
     
-    # Sort the index by keys
-    sorted_index = dict(sorted(index.items()))
+    # Write index to file without exposing a partially written index
+    write_atomic(real_output, json.dumps(sorted_index, indent=4))
+
+async def ask_email_sender(client: httpx.AsyncClient, email_content: str) -> str:
+    """Ask the LLM for the sender's address of an email it couldn't be parsed from."""
+    response = await client.post(
+        OPENAI_CHAT_URL,
+        headers={"Authorization": f"Bearer {AIPROXY_TOKEN}"},
+        json={
+            "model": "gpt-4o-mini",
+            "messages": [
+                {
+                    "role": "system",
+                    "content": "Extract the sender's email address from this email message. Return only the email address, nothing else."
+                },
+                {
+                    "role": "user",
+                    "content": email_content
+                }
+            ]
+        }
+    )
     
-    # Write index to file
-    with open(real_output, 'w', encoding='utf-8') as f:
-        json.dump(sorted_index, f, indent=4)
+    if response.status_code != 200:
+        raise Exception("Failed to extract email using LLM")
+        
+    result = response.json()
+    return result["choices"][0]["message"]["content"].strip()
+
+async def A7(filename: str = '/data/email.txt', output_file: str = '/data/email-sender.txt', client: httpx.AsyncClient = None):
+    """Extract sender's email from the headers, asking the LLM only for malformed messages.
 
-async def A7(filename: str = '/data/email.txt', output_file: str = '/data/email-sender.txt'):
-    """Extract sender's email using LLM."""
+    When filename is a directory, every file in it is processed and output_file
+    gets a JSON object mapping file names to sender addresses.
+    """
     ensure_data_path(filename)
     ensure_data_path(output_file)
     real_input = get_real_path(filename)
     real_output = get_real_path(output_file)
     
-    with open(real_input, 'r') as f:
-        email_content = f.read()
-        
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            OPENAI_CHAT_URL,
-            headers={"Authorization": f"Bearer {AIPROXY_TOKEN}"},
-            json={
-                "model": "gpt-4o-mini",
-                "messages": [
-                    {
-                        "role": "system",
-                        "content": "Extract the sender's email address from this email message. Return only the email address, nothing else."
-                    },
-                    {
-                        "role": "user",
-                        "content": email_content
-                    }
-                ]
-            }
-        )
-        
-        if response.status_code != 200:
-            raise Exception("Failed to extract email using LLM")
-            
-        result = response.json()
-        email_address = result["choices"][0]["message"]["content"].strip()
-        
+    if os.path.isdir(real_input):
+        names = sorted(name for name in os.listdir(real_input) if os.path.isfile(os.path.join(real_input, name)))
+    else:
+        names = [None]
+    
+    semaphore = asyncio.Semaphore(EMAIL_LLM_CONCURRENCY)
+    llm_calls = 0
+    
+    def read_sender(path):
+        with open(path, 'r', errors='replace') as f:
+            email_content = f.read()
+        return email_content, sender_address(email_content)
+    
+    async def extract(name, client):
+        nonlocal llm_calls
+        path = os.path.join(real_input, name) if name else real_input
+        # Read and parse off the event loop, only the LLM call is awaited here
+        email_content, address = await asyncio.to_thread(read_sender, path)
+        if address:
+            return address
+        llm_calls += 1
+        async with semaphore:
+            return await ask_email_sender(client, email_content)
+    
+    async with use_client(client) as client:
+        senders = await asyncio.gather(*[extract(name, client) for name in names])
+    
+    if names == [None]:
         with open(real_output, 'w') as f:
-            f.write(email_address)
+            f.write(senders[0])
+        return f"Extracted sender {senders[0]}" + (" using the LLM" if llm_calls else " from the headers")
+    
+    with open(real_output, 'w') as f:
+        json.dump(dict(zip(names, senders)), f, indent=2)
+    return f"Extracted {len(names)} senders ({llm_calls} needed the LLM)"
+
+async def A8(image_path: str = '/data/credit_card.png', output_file: str = '/data/credit-card.txt', client: httpx.AsyncClient = None):
+    """Extract credit card number from image.
 
-async def A8(image_path: str = '/data/credit_card.png', output_file: str = '/data/credit-card.txt'):
-    """Extract credit card number from image."""
+    A local OCR backend is tried first; the vision LLM is only called when it
+    finds no Luhn-valid number with at least OCR_MIN_CONFIDENCE.
+    """
     ensure_data_path(image_path)
     ensure_data_path(output_file)
     real_input = get_real_path(image_path)
     real_output = get_real_path(output_file)
     
     try:
-        # Validate and preprocess image
-        img = Image.open(real_input)
-        img = img.convert('RGB')  # Convert to RGB to ensure compatibility
-        
-        # Save as temporary PNG for consistent format
-        temp_path = os.path.join(os.path.dirname(real_input), 'temp.png')
-        img.save(temp_path, format='PNG')
+        if OCR_BACKEND != "none":
+            # Decoding and OCR are CPU-bound, keep them off the event loop.
+            # Any local failure falls through to the vision LLM
+            try:
+                card_number, confidence = await asyncio.to_thread(read_card_number, real_input, OCR_BACKEND)
+            except Exception as e:
+                card_number, confidence = None, 0.0
+                print(f"Local OCR failed, asking the LLM: {str(e)}")  # Debug log
+            if card_number and confidence >= OCR_MIN_CONFIDENCE:
+                with open(real_output, 'w') as f:
+                    f.write(card_number)
+                return f"Successfully extracted card number: {card_number}"
+            print(f"Local OCR not confident ({confidence:.2f}), asking the LLM")  # Debug log
         
-        # Read and encode image
-        with open(temp_path, 'rb') as f:
-            image_data = base64.b64encode(f.read()).decode('utf-8')
-            
-        # Clean up temp file
-        os.remove(temp_path)
+        # Crop, shrink and encode the image in memory, in a worker thread
+        image_url = await asyncio.to_thread(image_data_url, real_input)
             
         # Make API call
         headers = {"Authorization": f"Bearer {AIPROXY_TOKEN}", "Content-Type": "application/json"}
@@ -242,7 +260,7 @@ async def A8(image_path: str = '/data/credit_card.png', output_file: str = '/dat
                         {
                             "type": "image_url",
                             "image_url": {
-                                "url": f"data:image/png;base64,{image_data}"
+                                "url": image_url
                             }
                         }
                     ]
@@ -251,7 +269,7 @@ async def A8(image_path: str = '/data/credit_card.png', output_file: str = '/dat
         }
         
         base_url = os.getenv("OPENAI_API_BASE_URL", "http://aiproxy.sanand.workers.dev/openai/v1")
-        async with httpx.AsyncClient() as client:
+        async with use_client(client) as client:
             response = await client.post(
                 f"{base_url}/chat/completions",
                 headers=headers,
@@ -276,71 +294,83 @@ async def A8(image_path: str = '/data/credit_card.png', output_file: str = '/dat
     except Exception as e:
         raise Exception(f"Failed to extract card number: {str(e)}")
 
-async def A9(filename: str = '/data/comments.txt', output_file: str = '/data/comments-similar.txt'):
-    """Find most similar comments using embeddings."""
+async def A9(filename: str = '/data/comments.txt', output_file: str = '/data/comments-similar.txt', client: httpx.AsyncClient = None, top_k: int = 1):
+    """Find most similar comments using embeddings.
+
+    With top_k > 1 the top_k most similar pairs are written, separated by blank lines.
+    """
     ensure_data_path(filename)
     ensure_data_path(output_file)
     real_input = get_real_path(filename)
     real_output = get_real_path(output_file)
     
     try:
-        # Read comments
-        with open(real_input, 'r') as f:
-            comments = [line.strip() for line in f if line.strip()]
+        # Stream comments in batches, keeping only their embeddings (or store rows)
+        # in memory and only requesting comments that aren't stored yet
+        store = get_embedding_store() if EMBEDDING_CACHE_ENABLED else None
+        rows, vectors, total = [], [], 0
+        batches = iter_chunks(iter_lines(real_input), STREAM_BATCH_LINES)
+        async with use_client(client) as client:
+            while True:
+                # Read each batch in a worker thread, only the embedding requests run on the loop
+                lines = await asyncio.to_thread(next, batches, None)
+                if lines is None:
+                    break
+                comments = [line.strip() for line in lines if line.strip()]
+                if not comments:
+                    continue
+                total += len(comments)
+                if store:
+                    rows.extend(await store.ensure(client, comments))
+                else:
+                    vectors.append(np.array(await fetch_embeddings(client, comments), dtype=np.float32))
             
-        if len(comments) < 2:
+        if total < 2:
             raise Exception("Need at least 2 comments to find similarities")
+        
+        def find_pairs():
+            embeddings_array = store.load(rows) if store else np.vstack(vectors)
             
-        # Get embeddings for all comments at once
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                OPENAI_EMBEDDINGS_URL,
-                headers={"Authorization": f"Bearer {AIPROXY_TOKEN}"},
-                json={
-                    "model": "text-embedding-3-small",
-                    "input": comments
-                }
-            )
+            # Find most similar pairs block by block instead of building the N x N matrix
+            pairs = most_similar_pairs(embeddings_array, top_k=int(top_k))
             
-            if response.status_code != 200:
-                raise Exception(f"Failed to get embeddings: {response.text}")
-                
-            result = response.json()
-            embeddings = [item["embedding"] for item in result["data"]]
-                
-        # Convert to numpy array for efficient computation
-        embeddings_array = np.array(embeddings)
-        
-        # Calculate cosine similarities between all pairs
-        similarities = 1 - cdist(embeddings_array, embeddings_array, metric='cosine')
-        
-        # Find most similar pair
-        np.fill_diagonal(similarities, -1)  # Exclude self-similarity
-        max_sim_idx = np.unravel_index(np.argmax(similarities), similarities.shape)
+            # Read back just the comments in the winning pairs
+            wanted = {index for _, i, j in pairs for index in (i, j)}
+            comments = {}
+            position = 0
+            for line in iter_lines(real_input):
+                if not line.strip():
+                    continue
+                if position in wanted:
+                    comments[position] = line.strip()
+                    if len(comments) == len(wanted):
+                        break
+                position += 1
+            
+            # Write result to file
+            with open(real_output, 'w') as f:
+                f.write("\n\n".join(f"{comments[i]}\n{comments[j]}" for _, i, j in pairs))
         
-        # Write result to file
-        with open(real_output, 'w') as f:
-            f.write(f"{comments[max_sim_idx[0]]}\n{comments[max_sim_idx[1]]}")
+        # Similarity search and file access are blocking, run them in a worker thread
+        await asyncio.to_thread(find_pairs)
             
         return "Successfully found most similar comments"
         
     except Exception as e:
         raise Exception(f"Failed to find similar comments: {str(e)}")
 
-async def A10(db_path: str = '/data/ticket-sales.db', output_file: str = '/data/ticket-sales-gold.txt'):
-    """Calculate total sales for Gold tickets."""
+async def A10(db_path: str = '/data/ticket-sales.db', output_file: str = '/data/ticket-sales-gold.txt', ticket_type: str = 'gold'):
+    """Calculate total sales (units * price) for a ticket type, Gold by default."""
     ensure_data_path(db_path)
     ensure_data_path(output_file)
     real_db = get_real_path(db_path)
     real_output = get_real_path(output_file)
     
-    conn = sqlite3.connect(real_db)
-    cursor = conn.cursor()
-    
-    cursor.execute("SELECT CAST(COALESCE(SUM(units * price), 0) AS FLOAT) as total FROM tickets WHERE LOWER(type) = 'gold'")
-    total = cursor.fetchone()[0]
-    
-    conn.close()
+    # Served from a per-type index or summary table rather than a full scan
+    total, plan = sum_by_type(real_db, ticket_type)
+    print(f"A10 query plan: {plan}")  # Debug log
     
     with open(real_output, 'w') as f:
         f.write(f"{total:.2f}")
+    
+    return f"Total sales for {ticket_type} tickets: {total:.2f} (query plan: {plan})"
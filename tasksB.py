@@ -1,7 +1,5 @@
 import os
 import httpx
-import sqlite3
-import duckdb
 import csv
 import pandas as pd
 from PIL import Image
@@ -16,29 +14,32 @@ import speech_recognition as sr
 import speech_recognition as sr
 from pydub import AudioSegment
 from config import *
+from http_client import use_client
+from download import download
+from crawler import crawl, get_http_cache
+from query_export import export_query, temporary_output
+from query_cache import get_query_cache
 
 # B1 and B2 are security requirements enforced by the config.py functions:
 # - ensure_data_path: Ensures paths are within /data
 # - get_real_path: Maps virtual paths to real paths
 # These are called by all functions that handle files
 
-async def B3(url: str, save_path: str):
-    """Fetch data from an API and save it."""
+async def B3(url: str, save_path: str, client: httpx.AsyncClient = None):
+    """Fetch data from an API and save it.
+
+    The body is streamed to disk and skipped when the server reports it
+    unchanged since the last fetch; interrupted downloads resume.
+    """
     ensure_data_path(save_path)
     real_path = get_real_path(save_path)
     
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url)
-        
-        if response.status_code != 200:
-            raise Exception(f"Failed to fetch data from {url}")
-            
-        # Ensure directory exists
-        os.makedirs(os.path.dirname(real_path), exist_ok=True)
-        
-        # Save response
-        with open(real_path, 'wb') as f:
-            f.write(response.content)
+    async with use_client(client) as client:
+        status = await download(client, url, real_path)
+    
+    if status == "not_modified":
+        return f"{save_path} is up to date"
+    return f"Saved {url} to {save_path}"
 
 async def B4(repo_url: str = 'https://github.com/milavdabgar/my-email-repo', commit_message: str = 'Test commit'):
     """Clone a git repo and make a commit."""
@@ -70,40 +71,40 @@ async def B4(repo_url: str = 'https://github.com/milavdabgar/my-email-repo', com
     subprocess.run(['git', 'add', 'test.txt'], cwd=repo_path, check=True)
     subprocess.run(['git', 'commit', '-m', commit_message], cwd=repo_path, check=True)
 
-async def B5(db_path: str, query: str, output_path: str):
-    """Run SQL query on SQLite/DuckDB database."""
+async def B5(db_path: str, query: str, output_path: str, output_format: str = None):
+    """Run SQL query on SQLite/DuckDB database.
+
+    Results are streamed to output_path as JSON (default), NDJSON, CSV or
+    Parquet, chosen by output_format or the file extension.
+    """
     ensure_data_path(db_path)
     ensure_data_path(output_path)
     real_db = get_real_path(db_path)
     real_output = get_real_path(output_path)
     
-    if db_path.endswith('.db'):
-        # SQLite
-        conn = sqlite3.connect(real_db)
-        cursor = conn.cursor()
-        cursor.execute(query)
-        columns = [desc[0] for desc in cursor.description]
-        results = [dict(zip(columns, row)) for row in cursor.fetchall()]
-        conn.close()
-    else:
-        # DuckDB
-        conn = duckdb.connect(real_db)
-        result = conn.execute(query)
-        columns = [desc[0] for desc in result.description]
-        results = [dict(zip(columns, row)) for row in result.fetchall()]
-        conn.close()
-        
-    # Save results
-    os.makedirs(os.path.dirname(real_output), exist_ok=True)
-    with open(real_output, 'w') as f:
-        json.dump(results, f, indent=2)
+    # Stream rows in batches into the writer, or COPY straight out of DuckDB,
+    # unless the same query already ran on this version of the database
+    rows = export_query(real_db, query, real_output, output_format, cache=get_query_cache())
+    return f"Wrote {rows} rows to {output_path}"
+
+async def B6(url: str, output_path: str, client: httpx.AsyncClient = None, urls: list = None, depth: int = 0):
+    """Scrape content from a website.
 
-async def B6(url: str, output_path: str):
-    """Scrape content from a website."""
+    With several URLs, a link depth or an .ndjson/.jsonl output it crawls
+    instead, writing one JSON line per page.
+    """
     ensure_data_path(output_path)
     real_output = get_real_path(output_path)
     
-    async with httpx.AsyncClient() as client:
+    seeds = list(dict.fromkeys(([url] if url else []) + list(urls or [])))
+    if len(seeds) > 1 or int(depth or 0) > 0 or output_path.endswith((".ndjson", ".jsonl")):
+        async with use_client(client) as client:
+            with temporary_output(real_output) as temp_path:
+                with open(temp_path, 'w', encoding='utf-8') as f:
+                    counts = await crawl(client, seeds, f, max_depth=int(depth or 0), cache=get_http_cache())
+        return f"Crawled {counts['pages']} pages ({counts['errors']} failed) to {output_path}"
+    
+    async with use_client(client) as client:
         response = await client.get(url)
         
         if response.status_code != 200:
@@ -0,0 +1,101 @@
+import sqlite3
+from config import *
+from db_pool import db_pool
+
+# Covering expression index: the per-type sum is answered from the index alone.
+# SQLite only treats it as covering when the raw type column is included too.
+TYPE_INDEX = "tickets_lower_type_sales"
+TYPE_INDEX_SQL = f"CREATE INDEX IF NOT EXISTS {TYPE_INDEX} ON tickets (LOWER(type), type, units, price)"
+
+SUMMARY_TABLE = "ticket_type_sales"
+
+# Summary table of totals per lower-cased type, kept current by triggers
+SUMMARY_SQL = [
+    f"CREATE TABLE {SUMMARY_TABLE} (type_key TEXT PRIMARY KEY, total REAL NOT NULL)",
+    f"""INSERT INTO {SUMMARY_TABLE} (type_key, total)
+        SELECT LOWER(type), COALESCE(SUM(units * price), 0) FROM tickets
+        WHERE type IS NOT NULL GROUP BY LOWER(type)""",
+    f"""CREATE TRIGGER {SUMMARY_TABLE}_insert AFTER INSERT ON tickets BEGIN
+        INSERT INTO {SUMMARY_TABLE} (type_key, total)
+        SELECT LOWER(NEW.type), COALESCE(NEW.units * NEW.price, 0) WHERE NEW.type IS NOT NULL
+        ON CONFLICT (type_key) DO UPDATE SET total = total + excluded.total;
+    END""",
+    f"""CREATE TRIGGER {SUMMARY_TABLE}_delete AFTER DELETE ON tickets BEGIN
+        UPDATE {SUMMARY_TABLE} SET total = total - COALESCE(OLD.units * OLD.price, 0)
+        WHERE type_key = LOWER(OLD.type);
+    END""",
+    f"""CREATE TRIGGER {SUMMARY_TABLE}_update AFTER UPDATE OF type, units, price ON tickets BEGIN
+        UPDATE {SUMMARY_TABLE} SET total = total - COALESCE(OLD.units * OLD.price, 0)
+        WHERE type_key = LOWER(OLD.type);
+        INSERT INTO {SUMMARY_TABLE} (type_key, total)
+        SELECT LOWER(NEW.type), COALESCE(NEW.units * NEW.price, 0) WHERE NEW.type IS NOT NULL
+        ON CONFLICT (type_key) DO UPDATE SET total = total + excluded.total;
+    END""",
+]
+
+SCAN_QUERY = "SELECT CAST(COALESCE(SUM(units * price), 0) AS FLOAT) FROM tickets WHERE LOWER(type) = ?"
+SUMMARY_QUERY = f"SELECT CAST(COALESCE(SUM(total), 0) AS FLOAT) FROM {SUMMARY_TABLE} WHERE type_key = ?"
+
+def _has_summary(conn: sqlite3.Connection) -> bool:
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (SUMMARY_TABLE,)).fetchone()
+    return row is not None
+
+def _has_index(conn: sqlite3.Connection) -> bool:
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (TYPE_INDEX,)).fetchone()
+    return row is not None
+
+def prepare_aggregate(path: str, strategy: str) -> None:
+    """Create the index or summary table a strategy needs, if it doesn't exist yet."""
+    if strategy == "scan":
+        return
+    if strategy not in ("index", "summary"):
+        raise ValueError(f"Unknown A10 strategy: {strategy}")
+
+    # Usually it is already there, which the pooled read-only connection can tell
+    with db_pool.sqlite(path, read_only=True) as conn:
+        if (_has_index if strategy == "index" else _has_summary)(conn):
+            return
+
+    conn = sqlite3.connect(path, timeout=30)
+    try:
+        if strategy == "index":
+            conn.execute(TYPE_INDEX_SQL)
+            conn.commit()
+            return
+        # Build the summary and its triggers in one write transaction so no insert is missed
+        conn.isolation_level = None
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if not _has_summary(conn):
+                for statement in SUMMARY_SQL:
+                    conn.execute(statement)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+
+def query_plan(conn: sqlite3.Connection, query: str, params: tuple = ()) -> str:
+    """Return SQLite's EXPLAIN QUERY PLAN for a query as one line."""
+    rows = conn.execute(f"EXPLAIN QUERY PLAN {query}", params).fetchall()
+    return "; ".join(row[-1] for row in rows)
+
+def sum_by_type(path: str, ticket_type: str = "gold", strategy: str = A10_STRATEGY):
+    """Total units * price for a ticket type (case-insensitive). Returns (total, query plan).
+
+    strategy "index" adds a covering expression index on LOWER(type), "summary"
+    maintains a per-type totals table with triggers, and "scan" leaves the
+    database untouched. When the database can't be written, it falls back to
+    whatever is already there.
+    """
+    try:
+        prepare_aggregate(path, strategy)
+    except sqlite3.OperationalError as e:
+        print(f"Could not prepare A10 {strategy} aggregate, querying as is: {str(e)}")  # Debug log
+
+    with db_pool.sqlite(path, read_only=True) as conn:
+        query = SUMMARY_QUERY if _has_summary(conn) and strategy != "scan" else SCAN_QUERY
+        params = (ticket_type.strip().lower(),)
+        total = conn.execute(query, params).fetchone()[0]
+        return total, query_plan(conn, query, params)